@@ -1,7 +1,8 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Request
+from fastapi.responses import StreamingResponse, JSONResponse, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
 import shutil
 import sys
 import os
@@ -12,16 +13,26 @@ if current_dir not in sys.path:
     sys.path.append(current_dir)
 
 from typing import Optional, List
-import datetime
+import asyncio
+import json
+import threading
+import time
 
 from src.ingestion import load_document, split_documents
-from src.database import get_vector_store, add_documents_to_store, init_db
-from src.rag import get_smart_response_chain
-from src.flashcards import get_flashcard_chain
-from src.quiz import get_quiz_chain
+from src.database import add_documents_to_store, init_db
+from src.index_versions import index_manager, list_source_files
 
 from src.auth import router as auth_router
 from src.chat_history import save_message, get_user_chats, get_chat_history, create_chat, delete_chat
+from src.profiler import IngestionProfiler, get_reports, get_report, chunking_summary
+from src.summaries import SUMMARIZE_ON_INGEST, schedule_summaries, get_topics, save_deck, take_deck, delete_summaries
+from src.models import model_manager
+from src.tabular import delete_table
+from src.streaming import cancel_on_disconnect, coalesce, sse_event, generation_metrics
+from src.documents import (
+    STATUS_READY, STATUS_FAILED, STATUS_LEGACY, register_document, set_document_chunks, set_document_status,
+    list_documents, get_document, delete_document_record, backfill_registry, source_path
+)
 
 app = FastAPI(title="Tutor LLM API")
 
@@ -44,13 +55,95 @@ try:
 except Exception as e:
     print(f"Error initializing database: {e}")
 
-# Initialize Vector Store on startup (or lazily)
-vector_store = get_vector_store()
+# The vector store, embeddings and LLM chain modules are initialized in a
+# background thread so the process starts accepting connections (and passes
+# liveness checks) immediately. Requests that need them wait on `_ready`, or
+# fail right away while the last attempt has failed; failed attempts are
+# retried every INIT_RETRY_S seconds.
+STARTUP_WAIT_TIMEOUT = float(os.getenv("STARTUP_WAIT_TIMEOUT", "30"))
+INIT_RETRY_S = float(os.getenv("INIT_RETRY_S", "10"))
+READY_POLL_S = 0.1
+
+_ready = threading.Event()
+_stop_init = threading.Event()
+_startup = {"started_at": time.time(), "ready_after_s": None, "error": None, "attempts": 0}
+
+def _initialize_backend():
+    started = time.perf_counter()
+    try:
+        # A version left "building" by a server that stopped mid re-index would otherwise stay stuck
+        index_manager.recover_stale_build()
+    except Exception as e:
+        print(f"Error recovering interrupted re-index: {e}")
+    while True:
+        _startup["attempts"] += 1
+        try:
+            store = index_manager.active_store()
+            # Touch the collection so Chroma opens its files now rather than on the first query
+            # (the NumPy backend maps its segments in its constructor)
+            if hasattr(store, "_collection"):
+                store._collection.count()
+            # Pull in the LangChain/Ollama chain modules ahead of the first request
+            import src.rag, src.flashcards, src.quiz
+            # Files uploaded before the document registry existed
+            backfilled = backfill_registry(list_source_files())
+            if backfilled:
+                print(f"Registered {backfilled} existing document(s).")
+            _startup["ready_after_s"] = round(time.perf_counter() - started, 3)
+            _startup["error"] = None
+            _ready.set()
+            print(f"Vector store ready after {_startup['ready_after_s']}s.")
+            return
+        except Exception as e:
+            _startup["error"] = str(e)
+            print(f"Error initializing vector store (attempt {_startup['attempts']}, retrying in {INIT_RETRY_S:g}s): {e}")
+        if _stop_init.wait(INIT_RETRY_S):
+            return
+
+@app.on_event("startup")
+def start_background_init():
+    threading.Thread(target=_initialize_backend, name="backend-init", daemon=True).start()
+    # Loads the chat/embedding models and keeps them warm; runs independently of readiness
+    model_manager.start()
+
+@app.on_event("shutdown")
+def stop_model_keep_warm():
+    _stop_init.set()
+    model_manager.stop()
+
+def _not_ready() -> HTTPException:
+    return HTTPException(status_code=503, detail=_startup["error"] or "Vector store is still initializing")
+
+def get_store():
+    """Return the active vector store, waiting for background initialization if needed."""
+    deadline = time.monotonic() + STARTUP_WAIT_TIMEOUT
+    while not _ready.is_set():
+        if _startup["error"] or time.monotonic() >= deadline:
+            raise _not_ready()
+        _ready.wait(READY_POLL_S)
+    return index_manager.active_store()
+
+async def get_store_async():
+    """`get_store` for async handlers; never blocks the event loop."""
+    deadline = time.monotonic() + STARTUP_WAIT_TIMEOUT
+    while not _ready.is_set():
+        if _startup["error"] or time.monotonic() >= deadline:
+            raise _not_ready()
+        await asyncio.sleep(READY_POLL_S)
+    return index_manager.active_store()
 
 class QueryRequest(BaseModel):
     question: str
     user_email: Optional[str] = None
     chat_id: Optional[str] = None
+    # "text" streams plain answer text; "sse" streams meta/token/done events
+    stream_format: str = "text"
+
+class BatchQueryRequest(BaseModel):
+    questions: List[str]
+    concurrency: Optional[int] = Field(None, ge=1)
+    # False answers every question from the documents (skips intent classification)
+    classify: bool = True
 
 class ChatRequest(BaseModel):
     user_email: str
@@ -58,30 +151,60 @@ class ChatRequest(BaseModel):
 
 class FlashcardRequest(BaseModel):
     topic: str
+    user_email: Optional[str] = None
 
 @app.get("/")
 def health_check():
     return {"status": "ok", "message": "Tutor LLM API is running"}
 
+@app.get("/healthz")
+def liveness():
+    """Liveness probe: the process is up and serving requests."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readiness():
+    """Readiness probe: the vector store and models are initialized."""
+    if not _ready.is_set():
+        status = "error" if _startup["error"] else "starting"
+        body = {"status": status, "error": _startup["error"], "attempts": _startup["attempts"],
+                "uptime_s": round(time.time() - _startup["started_at"], 3)}
+        return JSONResponse(status_code=503, content=body)
+    return {"status": "ready", "ready_after_s": _startup["ready_after_s"]}
+
 @app.get("/files")
-def list_files():
-    """List all files in the data directory."""
-    data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
-    if not os.path.exists(data_dir):
-        return []
-    
-    files = []
-    for filename in os.listdir(data_dir):
-        file_path = os.path.join(data_dir, filename)
-        if os.path.isfile(file_path):
-            stats = os.stat(file_path)
-            # Simple metadata
-            files.append({
-                "name": filename,
-                "size": stats.st_size,
-                "modified": datetime.datetime.fromtimestamp(stats.st_mtime).isoformat()
-            })
-    return files
+def list_files(limit: int = 50, offset: int = 0, owner: Optional[str] = None, status: Optional[str] = None):
+    """List registered documents, most recently updated first."""
+    limit = max(1, min(limit, 500))
+    return list_documents(limit=limit, offset=max(0, offset), owner=owner, status=status)
+
+@app.get("/files/{document_id}")
+def get_file(document_id: int):
+    """Registry entry of a document, including its chunk ids per index version."""
+    document = get_document(document_id)
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return document
+
+@app.delete("/files/{document_id}")
+def delete_file(document_id: int):
+    """Remove a document's vectors from every index version, then the file and its registry entry."""
+    document = get_document(document_id)
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    get_store()
+
+    file_path = source_path(document["filename"])
+    if document["chunk_ids"]:
+        deleted = index_manager.delete_chunks(document["chunk_ids"])
+    else:
+        deleted = index_manager.delete_by_source(file_path)
+    delete_summaries(document["filename"])
+    delete_table(document["filename"])
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    delete_document_record(document_id)
+    return {"message": "Document deleted", "filename": document["filename"], "chunks_deleted": deleted}
 
 @app.get("/chats")
 def list_user_chats(user_email: str):
@@ -114,6 +237,11 @@ async def ingest_document(
     user_email: Optional[str] = Form(None),
     chat_id: Optional[str] = Form(None)
 ):
+    await get_store_async()
+    # Saving, OCR, splitting and embedding are all blocking; keep them off the event loop
+    return await run_in_threadpool(_ingest_upload, file, user_email, chat_id)
+
+def _ingest_upload(file: UploadFile, user_email: Optional[str], chat_id: Optional[str]):
     try:
         # Define storage path
         data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
@@ -129,71 +257,323 @@ async def ingest_document(
         if user_email and chat_id:
              save_message(user_email, chat_id, "user", f" Uploaded: {file.filename}")
 
+        document = register_document(file.filename, file_path, owner=user_email)
+        previous = document["previous"]
+        if previous and previous["status"] == STATUS_READY and previous["file_hash"] == document["file_hash"]:
+            # Same content re-uploaded: keep the existing vectors
+            set_document_chunks(document["id"], previous["chunk_ids"])
+            set_document_status(document["id"], STATUS_READY)
+            if user_email and chat_id:
+                save_message(user_email, chat_id, "bot", f"📄 Document already processed: **{file.filename}**")
+            return {"message": "Document unchanged", "filename": file.filename, "document_id": document["id"], "chunks": previous["chunk_count"]}
+        if previous:
+            # Replaced file: drop the vectors of the old version of it
+            if previous["chunk_ids"]:
+                index_manager.delete_chunks(previous["chunk_ids"])
+            elif previous["status"] == STATUS_LEGACY:
+                index_manager.delete_by_source(file_path)
+
         # Trigger ingestion
-        docs = load_document(file_path)
-        splits = split_documents(docs)
-        add_documents_to_store(vector_store, splits)
+        profiler = IngestionProfiler(file_path).start()
+        try:
+            docs = load_document(file_path, profiler=profiler)
+            # While a new index version is being built, write to it as well as the active one.
+            # The first target is the active version; only its work goes into the report.
+            targets = index_manager.write_targets()
+            (version, store, config), building = targets[0], targets[1:]
+            splits = split_documents(docs, chunk_size=config.get("chunk_size"), chunk_overlap=config.get("chunk_overlap"), profiler=profiler)
+            chunk_ids = {version: add_documents_to_store(store, splits, profiler=profiler)}
+            for building_version, building_store, building_config in building:
+                # Recorded first so the build, in whichever worker runs it, skips or drops its own copy
+                index_manager.note_ingested(file.filename, building_version)
+                building_splits = split_documents(docs, chunk_size=building_config.get("chunk_size"), chunk_overlap=building_config.get("chunk_overlap"))
+                chunk_ids[building_version] = add_documents_to_store(building_store, building_splits)
+                # Chunks the build already wrote for this file before the upload was recorded
+                current = (get_document(document["id"]) or {}).get("chunk_ids", {})
+                own = set(chunk_ids[building_version])
+                stale = [i for i in current.get(building_version, []) if i not in own]
+                if stale:
+                    index_manager.delete_chunks({building_version: stale})
+            set_document_chunks(document["id"], chunk_ids)
+        except Exception as e:
+            profiler.finish(status="error", error=str(e))
+            set_document_status(document["id"], STATUS_FAILED, str(e))
+            raise
+        report = profiler.finish()
+        set_document_status(document["id"], STATUS_READY)
+
+        # Summaries, topic outline and optional pre-warmed decks are built in the background
+        if SUMMARIZE_ON_INGEST and splits:
+            schedule_summaries(file.filename, splits, vector_store=store)
         
         # Log bot message if context provided
         if user_email and chat_id:
             save_message(user_email, chat_id, "bot", f"📄 Document processed: **{file.filename}**")
 
-        return {"message": "Ingestion complete", "filename": file.filename, "chunks": len(splits)}
+        return {"message": "Ingestion complete", "filename": file.filename, "document_id": document["id"], "chunks": len(splits), "report_id": report["id"]}
     except Exception as e:
         print(f"Error during ingestion: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/ingest/reports")
+def list_ingestion_reports(filename: Optional[str] = None, limit: int = 50, min_wall_s: Optional[float] = None):
+    """List ingestion reports, newest first."""
+    return get_reports(filename=filename, limit=limit, min_wall_s=min_wall_s)
+
+@app.get("/ingest/chunking")
+def get_chunking_summary(filename: Optional[str] = None):
+    """Chunks and embedded tokens per document vs. the old fixed 1000/200 split."""
+    return chunking_summary(filename=filename)
+
+@app.get("/ingest/reports/{report_id}")
+def get_ingestion_report(report_id: str):
+    """Get a single ingestion report."""
+    report = get_report(report_id)
+    if not report:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return report
+
+class ReindexRequest(BaseModel):
+    embedding_model: Optional[str] = None
+    chunk_size: Optional[int] = None
+    chunk_overlap: Optional[int] = None
+    batch_size: int = 64
+    max_chunks_per_s: Optional[float] = None
+    backend: Optional[str] = None
+
+@app.get("/tables/{filename}")
+def get_table(filename: str):
+    """Sheets, columns and row counts of an ingested CSV/Excel file."""
+    from src.tabular import describe_table
+    try:
+        return {"filename": filename, "sheets": describe_table(filename)}
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.get("/tables/{filename}/rows")
+def get_table_rows(filename: str, sheet: Optional[str] = None, column: Optional[str] = None,
+                   value: Optional[str] = None, limit: int = 50, offset: int = 0):
+    """Exact lookup in the raw rows of an ingested table (column == value), or a page of rows."""
+    from src.tabular import lookup_rows
+    try:
+        return lookup_rows(filename, sheet, column, value, limit=min(limit, 1000), offset=offset)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=str(e.args[0]))
+
+@app.get("/index/versions")
+def get_index_versions():
+    """Active and building index versions, plus progress of the current re-index."""
+    return index_manager.status()
+
+@app.post("/index/reindex")
+def start_reindex(request: ReindexRequest):
+    """Build a new index version from the files in data/ while the active one keeps serving."""
+    try:
+        # An explicit null chunk_size/chunk_overlap selects adaptive chunking; leaving it out keeps the active version's
+        chunking = {key: getattr(request, key) for key in ("chunk_size", "chunk_overlap") if key in request.model_fields_set}
+        return index_manager.start_reindex(
+            embedding_model=request.embedding_model,
+            **chunking,
+            batch_size=request.batch_size,
+            max_chunks_per_s=request.max_chunks_per_s,
+            backend=request.backend
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/index/reindex/cancel")
+def cancel_reindex():
+    """Stop the running re-index and discard the partially built version."""
+    index_manager.cancel_reindex()
+    return index_manager.status()
+
+@app.delete("/index/versions/{version}")
+def delete_index_version(version: str):
+    """Garbage collect a retired index version."""
+    if not index_manager.garbage_collect(version):
+        raise HTTPException(status_code=409, detail="Version is active, building or unknown")
+    return {"message": f"Deleted index version {version}"}
 
 @app.post("/query")
-async def query_rag(request: QueryRequest):
+async def query_rag(request: QueryRequest, http_request: Request):
+    store = await get_store_async()
+    sse = request.stream_format == "sse" or "text/event-stream" in http_request.headers.get("accept", "")
     try:
+        from src.rag import get_smart_response_chain, format_docs, describe_sources
+
         # Get chains
-        chains = get_smart_response_chain(vector_store)
-        
+        chains = get_smart_response_chain(store)
+        timings = {}
+        started = time.perf_counter()
+
         # 1. Classify Intent
-        intent = chains["classifier"].invoke({"question": request.question})
-        print(f"Detected Intent: {intent.strip()}")
-        
+        intent = (await chains["classifier"].ainvoke({"question": request.question})).strip()
+        timings["classify_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        print(f"Detected Intent: {intent}")
+
         # 2. Select Chain
-        if "GREETING" in intent.strip() or "GENERAL" in intent.strip():
-             selected_chain = chains["general"]
-             # For general chat, we pass just the question
-             input_data = {"question": request.question}
+        sources = []
+        if "GREETING" in intent or "GENERAL" in intent:
+            selected_chain = chains["general"]
+            stream_input = {"question": request.question}
         else:
-             # Default to RAG for TEXTBOOK or uncertain cases
-             selected_chain = chains["rag"]
-             input_data = request.question # RAG chain expects string input for RunnablePassthrough usually, or dict
-
-        # 3. Stream Response
-        async def generate():
-            full_response = ""
-            # Save user message if tracking is enabled
-            if request.user_email and request.chat_id:
-                save_message(request.user_email, request.chat_id, "user", request.question)
-
-            stream_input = request.question if selected_chain == chains["rag"] else {"question": request.question}
-
-            for chunk in selected_chain.stream(stream_input):
-                full_response += str(chunk)
-                yield chunk
-            
-            # Save bot response if tracking is enabled
-            if request.user_email and request.chat_id:
-                save_message(request.user_email, request.chat_id, "bot", full_response)
-
-        return StreamingResponse(generate(), media_type="text/plain")
+            # Default to RAG for TEXTBOOK or uncertain cases
+            retrieve_started = time.perf_counter()
+            docs = await chains["retriever"].ainvoke(request.question)
+            timings["retrieve_ms"] = round((time.perf_counter() - retrieve_started) * 1000, 1)
+            sources = describe_sources(docs)
+            selected_chain = chains["answer"]
+            stream_input = {"context": format_docs(docs), "question": request.question}
     except Exception as e:
         print(f"Error during query: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+    # 3. Stream Response
+    async def generate():
+        # Save user message if tracking is enabled
+        if request.user_email and request.chat_id:
+            await run_in_threadpool(save_message, request.user_email, request.chat_id, "user", request.question)
+
+        if sse:
+            yield sse_event("meta", {"intent": intent, "sources": sources, "timings": timings})
+
+        state = {}
+        parts = []
+        frames = 0
+        generation_started = time.perf_counter()
+        first_frame_ms = None
+        failed = False
+        try:
+            # Stops pulling tokens (and closes the model request) when the client goes away
+            tokens = cancel_on_disconnect(selected_chain.astream(stream_input), http_request, state)
+            async for frame in coalesce(tokens):
+                if first_frame_ms is None:
+                    first_frame_ms = round((time.perf_counter() - started) * 1000, 1)
+                parts.append(frame)
+                frames += 1
+                yield sse_event("token", {"text": frame}) if sse else frame
+            if sse and not state.get("cancelled"):
+                yield sse_event("done", {"timings": dict(
+                    timings,
+                    first_token_ms=first_frame_ms,
+                    generation_ms=round((time.perf_counter() - generation_started) * 1000, 1),
+                    total_ms=round((time.perf_counter() - started) * 1000, 1),
+                ), "chars": sum(len(p) for p in parts), "frames": frames})
+        except Exception as e:
+            failed = True
+            generation_metrics.record_error()
+            print(f"Error during query stream: {e}")
+            if sse:
+                yield sse_event("error", {"detail": str(e)})
+        finally:
+            # Runs on cancellation too, so no awaits here
+            full_response = "".join(parts)
+            elapsed = time.perf_counter() - generation_started
+            if state.get("cancelled"):
+                generation_metrics.record_cancelled(elapsed, len(full_response))
+                print(f"Client disconnected; generation cancelled after {elapsed:.2f}s")
+            elif not failed:
+                generation_metrics.record_completed(elapsed, len(full_response))
+            # Save bot response (partial if cancelled) if tracking is enabled
+            if request.user_email and request.chat_id and full_response:
+                save_message(request.user_email, request.chat_id, "bot", full_response)
+
+    if sse:
+        return StreamingResponse(generate(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    return StreamingResponse(generate(), media_type="text/plain")
+
+QUERY_BATCH_MAX = int(os.getenv("QUERY_BATCH_MAX", "200"))
+
+@app.post("/query/batch")
+async def query_batch(request: BatchQueryRequest, http_request: Request):
+    """
+    Answers many questions in one request. Streams one JSON object per line
+    (NDJSON) as each answer completes; results carry the question's `index`.
+    """
+    if not request.questions:
+        raise HTTPException(status_code=400, detail="No questions given")
+    if len(request.questions) > QUERY_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {QUERY_BATCH_MAX} questions per batch")
+    store = await get_store_async()
+    from src.rag import answer_batch, BATCH_CONCURRENCY
+
+    concurrency = min(request.concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY)
+
+    async def generate():
+        results = answer_batch(store, request.questions, concurrency=concurrency, classify=request.classify)
+        # Disconnecting stops the batch and cancels answers still being generated
+        async for result in cancel_on_disconnect(results, http_request, {}):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+class ExportRequest(BaseModel):
+    user_email: Optional[str] = None
+    format: str = "docx"
+    chats: bool = True
+    decks: bool = True
+
+@app.post("/exports", status_code=202)
+def create_export(request: ExportRequest):
+    """Starts a background export of chats and decks to a ZIP of DOCX or Markdown files."""
+    from src.exports import start_export, FORMATS
+    if request.format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(FORMATS)}")
+    return start_export(request.user_email, request.format, request.chats, request.decks)
+
+@app.get("/exports/{export_id}")
+def get_export_status(export_id: str):
+    from src.exports import get_export
+    status = get_export(export_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Export not found")
+    return status
+
+@app.get("/exports/{export_id}/download")
+def download_export(export_id: str):
+    from src.exports import get_export, archive_path
+    status = get_export(export_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Export not found")
+    if status["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Export is {status['status']}")
+    return FileResponse(archive_path(export_id), media_type="application/zip", filename=f"tutor-export-{export_id[:8]}.zip")
+
+@app.get("/models/status")
+def get_model_status():
+    """Warm-up results, keep_alive policy and keep-warm pings of the Ollama models."""
+    return model_manager.status()
+
+@app.get("/metrics/generation")
+def get_generation_metrics():
+    """Completed/cancelled generation counts and estimated model time saved (this worker)."""
+    return generation_metrics.snapshot()
+
+@app.get("/topics")
+def list_topics(filename: Optional[str] = None):
+    """Precomputed document summaries and topic outlines (no LLM call)."""
+    return get_topics(filename)
+
 @app.post("/flashcards")
 def generate_flashcards(request: FlashcardRequest):
+    # Serve a pre-warmed deck if one is waiting for this topic
+    deck = take_deck("flashcards", request.topic, {}, owner=request.user_email)
+    if deck is not None:
+        return {"topic": request.topic, "flashcards": deck}
+
+    store = get_store()
     try:
-        flashcard_chain = get_flashcard_chain(vector_store)
+        from src.flashcards import get_flashcard_chain
+
+        flashcard_chain = get_flashcard_chain(store)
         # The chain input is just the topic string because of RunnablePassthrough assigned to "topic"
         response = flashcard_chain.invoke(request.topic)
-        return {"topic": request.topic, "flashcards": response["flashcards"] if "flashcards" in response else response}
+        flashcards = response["flashcards"] if "flashcards" in response else response
+        save_deck("flashcards", request.topic, {}, flashcards, "request", owner=request.user_email)
+        return {"topic": request.topic, "flashcards": flashcards}
     except Exception as e:
         print(f"Error generating flashcards: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -202,21 +582,60 @@ class QuizRequest(BaseModel):
     topic: str
     count: int = 5
     difficulty: str = "Medium"
+    user_email: Optional[str] = None
 
 @app.post("/generate_quiz")
 def generate_quiz(request: QuizRequest):
+    params = {"count": request.count, "difficulty": request.difficulty}
+    deck = take_deck("quiz", request.topic, params, owner=request.user_email)
+    if deck is not None:
+        return deck
+
+    store = get_store()
     try:
-        quiz_func = get_quiz_chain(vector_store)
+        from src.quiz import get_quiz_chain
+
+        quiz_func = get_quiz_chain(store)
         result = quiz_func({
             "topic": request.topic,
             "count": request.count,
             "difficulty": request.difficulty
         })
+        save_deck("quiz", request.topic, params, result, "request", owner=request.user_email)
         return result
     except Exception as e:
         print(f"Error generating quiz: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def check_multi_worker_config(workers: int):
+    """
+    Several worker processes can't share an embedded Chroma directory or the
+    NumPy index (both assume a single writer), so multi-worker mode needs a
+    Chroma server. Chats, the SQLite database and the index manifest are
+    already safe to share between processes.
+    """
+    from src.database import VECTOR_BACKEND, CHROMA_SERVER_HOST
+    if workers <= 1:
+        return
+    if VECTOR_BACKEND != "chroma":
+        raise SystemExit(f"VECTOR_BACKEND={VECTOR_BACKEND} only supports a single worker; use Chroma server mode for --workers > 1")
+    if not CHROMA_SERVER_HOST:
+        raise SystemExit("--workers > 1 requires CHROMA_SERVER_HOST (start one with: chroma run --path ./chroma_server --port 8001)")
+
 if __name__ == "__main__":
+    import argparse
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+
+    parser = argparse.ArgumentParser(description="Tutor LLM API server")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")), help="Worker processes (0 = one per CPU core)")
+    args = parser.parse_args()
+
+    workers = args.workers or os.cpu_count() or 1
+    check_multi_worker_config(workers)
+    if workers == 1:
+        uvicorn.run(app, host=args.host, port=args.port)
+    else:
+        # Workers re-import the app by name, one process each
+        uvicorn.run("server:app", host=args.host, port=args.port, workers=workers, app_dir=current_dir)
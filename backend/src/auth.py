@@ -5,9 +5,13 @@ Handles Google OAuth 2.0 login flow for TutorLLM
 
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import RedirectResponse
+from starlette.concurrency import run_in_threadpool
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import httpx
 import sys
 import os
+import time
 from urllib.parse import urlencode
 from jose import jwt
 from datetime import datetime, timedelta
@@ -40,9 +44,27 @@ GOOGLE_USERINFO_URL = "https://www.googleapis.com/oauth2/v2/userinfo"
 from passlib.context import CryptContext
 from pydantic import BaseModel
 from src.database import get_user_by_email, create_user
+from src.cache import TTLCache
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt costs tens of milliseconds of CPU per call, so hashing runs on a
+# dedicated pool (bcrypt releases the GIL) instead of the event loop. At most
+# HASH_MAX_PENDING calls may be queued or running; beyond that requests wait up
+# to HASH_QUEUE_TIMEOUT seconds for a slot and are then rejected with 503.
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", str(HASH_WORKERS * 8)))
+HASH_QUEUE_TIMEOUT = float(os.getenv("HASH_QUEUE_TIMEOUT", "5"))
+
+_hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_slots = None
+
+# Decoded payloads of verified tokens, each kept until the token's own expiry
+_token_cache = TTLCache(maxsize=4096, ttl=3600)
+
+# Shared client for Google OAuth calls, so logins reuse pooled connections
+_http_client = None
+
 class SignupRequest(BaseModel):
     name: str
     email: str
@@ -58,6 +80,47 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+async def _run_hashing(func, *args):
+    """Runs a bcrypt call on the hashing pool, rejecting the request if the pool is saturated."""
+    global _hash_slots
+    if _hash_slots is None:
+        _hash_slots = asyncio.Semaphore(HASH_MAX_PENDING)
+    try:
+        await asyncio.wait_for(_hash_slots.acquire(), timeout=HASH_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Server is busy, please try again", headers={"Retry-After": "1"})
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, func, *args)
+    finally:
+        _hash_slots.release()
+
+def get_http_client() -> httpx.AsyncClient:
+    """Returns the shared AsyncClient, creating it on first use."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(10.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+        )
+    return _http_client
+
+@router.on_event("shutdown")
+async def close_auth_resources():
+    if _http_client is not None:
+        await _http_client.aclose()
+    _hash_executor.shutdown(wait=False)
+
+def decode_token(token: str) -> dict:
+    """Decodes and verifies a JWT, serving repeat verifications from the cache until expiry."""
+    payload = _token_cache.get(token)
+    if payload is not None:
+        return payload
+    payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+    remaining = payload.get("exp", 0) - time.time()
+    if remaining > 0:
+        _token_cache.set(token, payload, ttl=remaining)
+    return payload
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -91,49 +154,49 @@ async def google_callback(code: str = None, error: str = None):
     
     try:
         # Exchange code for tokens
-        async with httpx.AsyncClient() as client:
-            token_response = await client.post(
-                GOOGLE_TOKEN_URL,
-                data={
-                    "client_id": GOOGLE_CLIENT_ID,
-                    "client_secret": GOOGLE_CLIENT_SECRET,
-                    "code": code,
-                    "grant_type": "authorization_code",
-                    "redirect_uri": GOOGLE_REDIRECT_URI
-                }
-            )
-            
-            if token_response.status_code != 200:
-                return RedirectResponse(url=f"{FRONTEND_URL}?error=token_exchange_failed")
-            
-            tokens = token_response.json()
-            access_token = tokens.get("access_token")
-            
-            # Get user info
-            userinfo_response = await client.get(
-                GOOGLE_USERINFO_URL,
-                headers={"Authorization": f"Bearer {access_token}"}
-            )
-            
-            if userinfo_response.status_code != 200:
-                return RedirectResponse(url=f"{FRONTEND_URL}?error=userinfo_failed")
-            
-            user_info = userinfo_response.json()
-            
-            # Create our own JWT token with user info
-            jwt_token = create_access_token({
-                "sub": user_info.get("id"),
-                "email": user_info.get("email"),
-                "name": user_info.get("name"),
-                "picture": user_info.get("picture")
-            })
-            
-            # Redirect to frontend with token
-            # Redirect to frontend with token
-            return RedirectResponse(
-                url=f"{FRONTEND_URL}/auth/callback?token={jwt_token}&name={user_info.get('name', '')}&email={user_info.get('email', '')}&picture={user_info.get('picture', '')}"
-            )
-            
+        client = get_http_client()
+        token_response = await client.post(
+            GOOGLE_TOKEN_URL,
+            data={
+                "client_id": GOOGLE_CLIENT_ID,
+                "client_secret": GOOGLE_CLIENT_SECRET,
+                "code": code,
+                "grant_type": "authorization_code",
+                "redirect_uri": GOOGLE_REDIRECT_URI
+            }
+        )
+        
+        if token_response.status_code != 200:
+            return RedirectResponse(url=f"{FRONTEND_URL}?error=token_exchange_failed")
+        
+        tokens = token_response.json()
+        access_token = tokens.get("access_token")
+        
+        # Get user info
+        userinfo_response = await client.get(
+            GOOGLE_USERINFO_URL,
+            headers={"Authorization": f"Bearer {access_token}"}
+        )
+        
+        if userinfo_response.status_code != 200:
+            return RedirectResponse(url=f"{FRONTEND_URL}?error=userinfo_failed")
+        
+        user_info = userinfo_response.json()
+        
+        # Create our own JWT token with user info
+        jwt_token = create_access_token({
+            "sub": user_info.get("id"),
+            "email": user_info.get("email"),
+            "name": user_info.get("name"),
+            "picture": user_info.get("picture")
+        })
+        
+        # Redirect to frontend with token
+        # Redirect to frontend with token
+        return RedirectResponse(
+            url=f"{FRONTEND_URL}/auth/callback?token={jwt_token}&name={user_info.get('name', '')}&email={user_info.get('email', '')}&picture={user_info.get('picture', '')}"
+        )
+        
     except Exception as e:
         print(f"OAuth Error: {e}")
         return RedirectResponse(url=f"{FRONTEND_URL}?error=oauth_failed")
@@ -143,14 +206,14 @@ async def google_callback(code: str = None, error: str = None):
 async def signup(request: SignupRequest):
     """Register a new user"""
     # Check if user already exists
-    if get_user_by_email(request.email):
+    if await run_in_threadpool(get_user_by_email, request.email):
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Hash password
-    password_hash = get_password_hash(request.password)
+    password_hash = await _run_hashing(get_password_hash, request.password)
     
     # Create user
-    if create_user(request.name, request.email, password_hash):
+    if await run_in_threadpool(create_user, request.name, request.email, password_hash):
         # Return success with a token immediately or just redirect to login
         # Let's generate a token so they are logged in immediately after signup
         token = create_access_token({
@@ -171,11 +234,11 @@ async def signup(request: SignupRequest):
 @router.post("/login")
 async def login(request: LoginRequest):
     """Login a user and return a JWT token"""
-    user = get_user_by_email(request.email)
+    user = await run_in_threadpool(get_user_by_email, request.email)
     if not user:
         raise HTTPException(status_code=404, detail="Account not found. Please create an account.")
     
-    if not verify_password(request.password, user["password"]):
+    if not await _run_hashing(verify_password, request.password, user["password"]):
         raise HTTPException(status_code=401, detail="Invalid password")
     
     # Create token
@@ -197,7 +260,7 @@ async def login(request: LoginRequest):
 async def verify_token(token: str):
     """Verify a JWT token and return user info"""
     try:
-        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        payload = decode_token(token)
         return {
             "valid": True,
             "user": {
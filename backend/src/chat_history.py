@@ -2,7 +2,9 @@ import json
 import os
 import uuid
 import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterator
+
+from src.locks import file_lock, atomic_write_text, remove_lock
 
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data")
 CHATS_DIR = os.path.join(DATA_DIR, "chats")
@@ -19,7 +21,13 @@ def save_message(user_email: str, chat_id: str, role: str, content: str, title:
     """Save a message to a specific chat session."""
     user_dir = _get_user_chat_dir(user_email)
     chat_file = os.path.join(user_dir, f"{chat_id}.json")
-    
+
+    # The read-modify-write below must not interleave with another thread or
+    # worker process appending to the same chat, or one of the messages is lost
+    with file_lock(chat_file):
+        _append_message(chat_file, chat_id, role, content, title)
+
+def _append_message(chat_file: str, chat_id: str, role: str, content: str, title: str = None):
     timestamp = datetime.datetime.now().isoformat()
     
     chat_data = {
@@ -51,8 +59,7 @@ def save_message(user_email: str, chat_id: str, role: str, content: str, title:
         "timestamp": timestamp
     })
     
-    with open(chat_file, "w") as f:
-        json.dump(chat_data, f, indent=2)
+    atomic_write_text(chat_file, json.dumps(chat_data, indent=2))
 
 def get_user_chats(user_email: str) -> List[Dict]:
     """Get a list of all chat sessions for a user."""
@@ -81,6 +88,17 @@ def get_user_chats(user_email: str) -> List[Dict]:
     chats.sort(key=lambda x: x.get("updated_at", ""), reverse=True)
     return chats
 
+def iter_user_chats(user_email: str) -> Iterator[Dict]:
+    """Yield a user's full chats one at a time, for exports."""
+    user_dir = _get_user_chat_dir(user_email)
+    for filename in sorted(os.listdir(user_dir)):
+        if filename.endswith(".json"):
+            try:
+                with open(os.path.join(user_dir, filename), "r") as f:
+                    yield json.load(f)
+            except Exception as e:
+                print(f"Error reading chat file {filename}: {e}")
+
 def get_chat_history(user_email: str, chat_id: str) -> Optional[Dict]:
     """Get full history for a specific chat."""
     user_dir = _get_user_chat_dir(user_email)
@@ -113,8 +131,8 @@ def create_chat(user_email: str, title: str = "New Chat") -> str:
         "messages": []
     }
     
-    with open(chat_file, "w") as f:
-        json.dump(chat_data, f, indent=2)
+    with file_lock(chat_file):
+        atomic_write_text(chat_file, json.dumps(chat_data, indent=2))
         
     return chat_id
 
@@ -122,5 +140,7 @@ def delete_chat(user_email: str, chat_id: str):
     """Delete a chat session."""
     user_dir = _get_user_chat_dir(user_email)
     chat_file = os.path.join(user_dir, f"{chat_id}.json")
-    if os.path.exists(chat_file):
-        os.remove(chat_file)
+    with file_lock(chat_file):
+        if os.path.exists(chat_file):
+            os.remove(chat_file)
+        remove_lock(chat_file)
@@ -1,60 +1,259 @@
-from langchain_ollama import OllamaEmbeddings
-from langchain_chroma import Chroma
-from typing import List
+from typing import List, Optional, TYPE_CHECKING
 from langchain_core.documents import Document
 import os
 
+from src.profiler import IngestionProfiler, TimedEmbeddings, attach_profiler, import_legacy_reports
+
 import sqlite3
+import threading
+
+from src.cache import TTLCache
+
+if TYPE_CHECKING:
+    from langchain_chroma import Chroma
 
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data")
 DB_PATH = os.path.join(DATA_DIR, "users.db")
 
-def init_db():
-    """Initializes the SQLite database and creates the users table."""
-    os.makedirs(DATA_DIR, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
+# Pragmas applied to every pooled connection. WAL lets readers proceed while a
+# writer commits; busy_timeout makes concurrent writers wait instead of failing.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+)
+
+# Versioned schema migrations, applied in order and tracked with PRAGMA user_version.
+# Never edit a released migration; append a new one instead.
+MIGRATIONS = [
+    (1, """
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT NOT NULL,
             email TEXT UNIQUE NOT NULL,
             password TEXT NOT NULL,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    conn.commit()
-    conn.close()
+        );
+    """),
+    (2, """
+        CREATE TABLE IF NOT EXISTS document_summaries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            section_index INTEGER,
+            title TEXT,
+            summary TEXT NOT NULL,
+            topics TEXT NOT NULL DEFAULT '[]',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE INDEX IF NOT EXISTS idx_document_summaries_filename ON document_summaries (filename, kind);
+        CREATE TABLE IF NOT EXISTS decks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            topic TEXT NOT NULL,
+            params TEXT NOT NULL DEFAULT '{}',
+            content TEXT NOT NULL,
+            source TEXT NOT NULL,
+            consumed INTEGER NOT NULL DEFAULT 0,
+            filename TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE INDEX IF NOT EXISTS idx_decks_lookup ON decks (kind, topic, consumed);
+    """),
+    (3, """
+        CREATE TABLE IF NOT EXISTS documents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT UNIQUE NOT NULL,
+            file_hash TEXT,
+            size INTEGER,
+            owner TEXT,
+            chunk_ids TEXT NOT NULL DEFAULT '{}',
+            chunk_count INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE INDEX IF NOT EXISTS idx_documents_updated ON documents (updated_at);
+        CREATE INDEX IF NOT EXISTS idx_documents_owner ON documents (owner, updated_at);
+        CREATE INDEX IF NOT EXISTS idx_documents_hash ON documents (file_hash);
+    """),
+    (4, """
+        CREATE TABLE IF NOT EXISTS ocr_pages (
+            file_hash TEXT NOT NULL,
+            page INTEGER NOT NULL,
+            settings TEXT NOT NULL,
+            text TEXT NOT NULL,
+            seconds REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (file_hash, page, settings)
+        );
+    """),
+    (5, """
+        ALTER TABLE decks ADD COLUMN owner TEXT;
+        CREATE INDEX IF NOT EXISTS idx_decks_owner ON decks (owner, consumed);
+    """),
+    (6, """
+        CREATE TABLE IF NOT EXISTS ingestion_reports (
+            id TEXT PRIMARY KEY,
+            filename TEXT,
+            status TEXT,
+            created_at TEXT,
+            wall_s REAL,
+            report TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_ingestion_reports_created ON ingestion_reports (created_at);
+        CREATE INDEX IF NOT EXISTS idx_ingestion_reports_filename ON ingestion_reports (filename, created_at);
+    """),
+]
+
+# One connection per thread: sqlite3 connections must not be shared across
+# threads, and FastAPI runs sync handlers on a pool of long-lived worker threads.
+_local = threading.local()
+
+# Only existing users are cached; caching misses would hide a user created by
+# another process until the entry expired.
+_user_cache = TTLCache(maxsize=1024, ttl=60)
+
+def get_connection() -> sqlite3.Connection:
+    """Returns this thread's pooled connection, opening it on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "path", None) != DB_PATH:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        conn = sqlite3.connect(DB_PATH, timeout=5.0)
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        _local.conn = conn
+        _local.path = DB_PATH
+    return conn
+
+def close_connection():
+    """Closes this thread's pooled connection, if any."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+def _statements(sql: str):
+    """Splits a migration script into single statements."""
+    statement = ""
+    for line in sql.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement.strip()
+            statement = ""
+    if statement.strip():
+        yield statement.strip()
+
+def migrate(conn: sqlite3.Connection = None) -> int:
+    """
+    Applies pending migrations and returns the resulting schema version. Each
+    migration runs with its version bump in one BEGIN IMMEDIATE transaction,
+    and user_version is re-read once the write lock is held, so workers that
+    start together apply every migration exactly once.
+    """
+    conn = conn or get_connection()
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+    for version, sql in MIGRATIONS:
+        if version <= current:
+            continue
+        # executescript() would commit first and run in autocommit mode
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            current = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version > current:
+                for statement in _statements(sql):
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {version}")
+                current = version
+                print(f"Applied database migration {version}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    return current
+
+def init_db():
+    """Initializes the SQLite database and brings its schema up to date."""
+    migrate()
+    _user_cache.clear()
+    import_legacy_reports()
 
 def get_user_by_email(email: str):
     """Retrieves a user by their email."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
-    user = cursor.fetchone()
-    conn.close()
+    user = _user_cache.get(email)
+    if user is not None:
+        return user
+    user = get_connection().execute("SELECT * FROM users WHERE email = ?", (email,)).fetchone()
+    if user is not None:
+        _user_cache.set(email, user)
     return user
 
 def create_user(name: str, email: str, password_hash: str):
     """Creates a new user in the database."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    conn = get_connection()
     try:
-        cursor.execute("INSERT INTO users (name, email, password) VALUES (?, ?, ?)", (name, email, password_hash))
-        conn.commit()
+        with conn:
+            conn.execute("INSERT INTO users (name, email, password) VALUES (?, ?, ?)", (name, email, password_hash))
         return True
     except sqlite3.IntegrityError:
         return False
     finally:
-        conn.close()
+        _user_cache.invalidate(email)
+
+# "chroma" (default) or "numpy" for the in-process memory-mapped index in src/vector_index.py
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+VECTOR_DTYPE = os.getenv("VECTOR_DTYPE", "float32")
+# When set, Chroma runs as a separate server (`chroma run --path ./chroma_server`) and every
+# worker process connects to it over HTTP instead of opening the directory itself.
+CHROMA_SERVER_HOST = os.getenv("CHROMA_SERVER_HOST")
+CHROMA_SERVER_PORT = int(os.getenv("CHROMA_SERVER_PORT", "8001"))
 
-def get_vector_store(collection_name: str = "rag_collection_v3", persist_directory: str = "./chroma_db_v3", embedding_model: str = "nomic-embed-text") -> Chroma:
+_chroma_client = None
+
+def get_chroma_client():
+    """Shared HTTP client for a Chroma server, or None in embedded mode."""
+    global _chroma_client
+    if not CHROMA_SERVER_HOST:
+        return None
+    if _chroma_client is None:
+        import chromadb
+        _chroma_client = chromadb.HttpClient(host=CHROMA_SERVER_HOST, port=CHROMA_SERVER_PORT)
+    return _chroma_client
+
+def get_vector_store(collection_name: str = "rag_collection_v3", persist_directory: str = "./chroma_db_v3", embedding_model: str = "nomic-embed-text", backend: str = None) -> "Chroma":
     """
-    Initializes and returns the Chroma vector store with Ollama embeddings.
+    Initializes and returns the vector store with Ollama embeddings.
+    Both backends expose the same LangChain VectorStore interface.
     """
-    # Initialize embeddings
-    embeddings = OllamaEmbeddings(model=embedding_model)
+    # Imported here so importing this module (e.g. for auth) doesn't load chromadb
+    from src.models import embedding_model as policy_embeddings
+
+    # Initialize embeddings (keep_alive follows the time-of-day policy per call)
+    embeddings = policy_embeddings(embedding_model)
+
+    if (backend or VECTOR_BACKEND) == "numpy":
+        from src.vector_index import NumpyVectorStore
+        return NumpyVectorStore(
+            embedding_function=embeddings,
+            persist_directory=os.path.join(persist_directory, collection_name),
+            dtype=VECTOR_DTYPE
+        )
+
+    from langchain_chroma import Chroma
+
+    client = get_chroma_client()
+    if client is not None:
+        # Client/server mode: the server owns persistence, so the directory is not used
+        return Chroma(
+            collection_name=collection_name,
+            embedding_function=embeddings,
+            client=client
+        )
 
     # Initialize Chroma
     vector_store = Chroma(
@@ -65,10 +264,25 @@ def get_vector_store(collection_name: str = "rag_collection_v3", persist_directo
     
     return vector_store
 
-def add_documents_to_store(vector_store: Chroma, documents: List[Document]):
+def add_documents_to_store(vector_store: "Chroma", documents: List[Document], profiler: Optional[IngestionProfiler] = None):
     """
-    Adds documents to the vector store.
+    Adds documents to the vector store and returns their ids.
+    With a profiler, embedding time and the remaining vector store write time are recorded separately.
     """
     print(f"Adding {len(documents)} documents to vector store...")
-    vector_store.add_documents(documents=documents)
+    if profiler is None:
+        ids = vector_store.add_documents(documents=documents)
+    else:
+        # Wrap the store's embedding function once so embed calls report to the attached profiler
+        if not isinstance(vector_store._embedding_function, TimedEmbeddings):
+            vector_store._embedding_function = TimedEmbeddings(vector_store._embedding_function)
+        embed_before = profiler.stages.get("embed", {}).get("wall_s", 0.0)
+        store_before = profiler.stages.get("store", {}).get("wall_s", 0.0)
+        with attach_profiler(profiler), profiler.stage("store"):
+            ids = vector_store.add_documents(documents=documents)
+        # Whatever part of the store stage wasn't embedding is the Chroma write
+        embed_time = profiler.stages.get("embed", {}).get("wall_s", 0.0) - embed_before
+        store_time = profiler.stages["store"]["wall_s"] - store_before
+        profiler.add_stage_time("vector_write", max(store_time - embed_time, 0.0))
     print("Documents added.")
+    return ids
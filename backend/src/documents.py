@@ -0,0 +1,187 @@
+"""
+Document registry: one row per uploaded file with its hash, size, owner,
+ingestion status and the ids of its chunks in each index version, so a file
+can be listed without touching the filesystem and removed from the index.
+"""
+import datetime
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+from src.database import DATA_DIR, get_connection
+
+STATUS_PROCESSING = "processing"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+# Present in data/ before the registry existed; chunk ids unknown
+STATUS_LEGACY = "legacy"
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _row_to_dict(row) -> Dict:
+    doc = dict(row)
+    doc["chunk_ids"] = json.loads(doc["chunk_ids"])
+    return doc
+
+
+def _now() -> str:
+    return datetime.datetime.now().isoformat(sep=" ", timespec="seconds")
+
+
+def get_document(doc_id: int) -> Optional[Dict]:
+    row = get_connection().execute("SELECT * FROM documents WHERE id = ?", (doc_id,)).fetchone()
+    return _row_to_dict(row) if row else None
+
+
+def get_document_by_filename(filename: str) -> Optional[Dict]:
+    row = get_connection().execute("SELECT * FROM documents WHERE filename = ?", (filename,)).fetchone()
+    return _row_to_dict(row) if row else None
+
+
+def register_document(filename: str, path: str, owner: str = None) -> Dict:
+    """
+    Records an upload as processing and returns its registry row. If the file
+    name was registered before, the previous row (with its chunk ids) is
+    returned under "previous" so the caller can drop or reuse the old vectors.
+    """
+    file_hash = file_sha256(path)
+    size = os.path.getsize(path)
+    previous = get_document_by_filename(filename)
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            """
+            INSERT INTO documents (filename, file_hash, size, owner, chunk_ids, chunk_count, status, error, updated_at)
+            VALUES (?, ?, ?, ?, '{}', 0, ?, NULL, ?)
+            ON CONFLICT(filename) DO UPDATE SET
+                file_hash = excluded.file_hash,
+                size = excluded.size,
+                owner = COALESCE(excluded.owner, documents.owner),
+                status = excluded.status,
+                error = NULL,
+                updated_at = excluded.updated_at
+            """,
+            (filename, file_hash, size, owner, STATUS_PROCESSING, _now())
+        )
+    doc = get_document_by_filename(filename)
+    doc["previous"] = previous
+    return doc
+
+
+def set_document_chunks(doc_id: int, chunk_ids: Dict[str, List[str]]):
+    """Replaces the chunk ids of a document ({index version: [ids]})."""
+    count = max((len(ids) for ids in chunk_ids.values()), default=0)
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "UPDATE documents SET chunk_ids = ?, chunk_count = ?, updated_at = ? WHERE id = ?",
+            (json.dumps(chunk_ids), count, _now(), doc_id)
+        )
+
+
+def add_document_chunks(filename: str, version: str, ids: List[str]):
+    """Appends chunk ids for one index version (used by re-index builds)."""
+    conn = get_connection()
+    with conn:
+        row = conn.execute("SELECT id, chunk_ids FROM documents WHERE filename = ?", (filename,)).fetchone()
+        if row is None:
+            return
+        chunk_ids = json.loads(row["chunk_ids"])
+        chunk_ids.setdefault(version, []).extend(ids)
+        conn.execute("UPDATE documents SET chunk_ids = ?, updated_at = ? WHERE id = ?", (json.dumps(chunk_ids), _now(), row["id"]))
+
+
+def remove_document_chunks(filename: str, version: str, ids: List[str]):
+    """Removes specific chunk ids of one index version from a document."""
+    drop = set(ids)
+    conn = get_connection()
+    with conn:
+        row = conn.execute("SELECT id, chunk_ids FROM documents WHERE filename = ?", (filename,)).fetchone()
+        if row is None:
+            return
+        chunk_ids = json.loads(row["chunk_ids"])
+        if version in chunk_ids:
+            chunk_ids[version] = [i for i in chunk_ids[version] if i not in drop]
+            conn.execute("UPDATE documents SET chunk_ids = ?, updated_at = ? WHERE id = ?", (json.dumps(chunk_ids), _now(), row["id"]))
+
+
+def drop_version_chunks(version: str):
+    """Forgets chunk ids of an index version that has been garbage collected."""
+    conn = get_connection()
+    with conn:
+        rows = conn.execute("SELECT id, chunk_ids FROM documents WHERE chunk_ids LIKE ?", (f'%"{version}"%',)).fetchall()
+        for row in rows:
+            chunk_ids = json.loads(row["chunk_ids"])
+            chunk_ids.pop(version, None)
+            conn.execute("UPDATE documents SET chunk_ids = ? WHERE id = ?", (json.dumps(chunk_ids), row["id"]))
+
+
+def set_document_status(doc_id: int, status: str, error: str = None):
+    conn = get_connection()
+    with conn:
+        conn.execute("UPDATE documents SET status = ?, error = ?, updated_at = ? WHERE id = ?", (status, error, _now(), doc_id))
+
+
+def list_documents(limit: int = 50, offset: int = 0, owner: str = None, status: str = None) -> Dict:
+    """A page of documents, most recently updated first."""
+    where, params = [], []
+    if owner:
+        where.append("owner = ?")
+        params.append(owner)
+    if status:
+        where.append("status = ?")
+        params.append(status)
+    clause = f" WHERE {' AND '.join(where)}" if where else ""
+
+    conn = get_connection()
+    total = conn.execute(f"SELECT COUNT(*) FROM documents{clause}", params).fetchone()[0]
+    rows = conn.execute(
+        f"SELECT id, filename, file_hash, size, owner, chunk_count, status, error, created_at, updated_at "
+        f"FROM documents{clause} ORDER BY updated_at DESC, id DESC LIMIT ? OFFSET ?",
+        params + [limit, offset]
+    ).fetchall()
+    items = []
+    for row in rows:
+        item = dict(row)
+        # Keep the fields the old os.listdir-based /files returned
+        item["name"] = item["filename"]
+        item["modified"] = item["updated_at"]
+        items.append(item)
+    return {"items": items, "total": total, "limit": limit, "offset": offset}
+
+
+def delete_document_record(doc_id: int):
+    conn = get_connection()
+    with conn:
+        conn.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+
+
+def backfill_registry(source_paths: List[str]) -> int:
+    """Registers files already in data/ from before the registry existed."""
+    added = 0
+    conn = get_connection()
+    for path in source_paths:
+        filename = os.path.basename(path)
+        if conn.execute("SELECT 1 FROM documents WHERE filename = ?", (filename,)).fetchone():
+            continue
+        stats = os.stat(path)
+        modified = datetime.datetime.fromtimestamp(stats.st_mtime).isoformat(sep=" ", timespec="seconds")
+        with conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO documents (filename, file_hash, size, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (filename, file_sha256(path), stats.st_size, STATUS_LEGACY, modified, modified)
+            )
+        added += 1
+    return added
+
+
+def source_path(filename: str) -> str:
+    return os.path.join(DATA_DIR, filename)
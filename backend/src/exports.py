@@ -0,0 +1,218 @@
+"""
+Bulk export of a user's chats and the generated flashcard decks and quizzes,
+as Markdown or DOCX files in a ZIP archive.
+
+Items are produced lazily (one chat file or one deck row at a time), DOCX
+rendering runs in a process pool with a bounded number of items in flight,
+and every rendered file is written to the archive as soon as it is ready, so
+memory use doesn't grow with the size of the export. Used by
+scripts/export_study_material.py and by the /exports background jobs.
+"""
+import datetime
+import json
+import multiprocessing
+import os
+import re
+import time
+import uuid
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple, Union
+
+from src.chat_history import iter_user_chats
+from src.database import DATA_DIR, get_connection
+from src.locks import atomic_write_text
+
+EXPORT_DIR = os.path.join(DATA_DIR, "exports")
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Finished archives are removed after this many hours
+EXPORT_TTL_HOURS = float(os.getenv("EXPORT_TTL_HOURS", "24"))
+FORMATS = ("docx", "md")
+
+# One export at a time; each already uses a process pool
+_job_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="exports")
+_JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+def _slug(text: str, max_length: int = 60) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", text or "").strip("-").lower()
+    return slug[:max_length] or "untitled"
+
+
+def chat_to_markdown(chat: Dict) -> str:
+    lines = [f"# {chat.get('title', 'Untitled Chat')}", "", f"Created {chat.get('created_at', '')}", ""]
+    for message in chat.get("messages", []):
+        speaker = "You" if message.get("role") == "user" else "Tutor"
+        lines += [f"## {speaker}", "", message.get("content", ""), ""]
+    return "\n".join(lines)
+
+
+def deck_to_markdown(kind: str, topic: str, content, created_at: str = None) -> str:
+    lines = [f"# {'Quiz' if kind == 'quiz' else 'Flashcards'}: {topic}", ""]
+    if created_at:
+        lines += [f"Generated {created_at}", ""]
+    if kind == "quiz":
+        questions = content.get("questions", []) if isinstance(content, dict) else content
+        for number, question in enumerate(questions, 1):
+            lines += [f"## Question {number}", "", question.get("question", ""), ""]
+            lines += [f"- {option}" for option in question.get("options", [])]
+            lines += ["", f"**Answer:** {question.get('answer', '')}", "", question.get("explanation", ""), ""]
+    else:
+        cards = content.get("flashcards", []) if isinstance(content, dict) else content
+        for number, card in enumerate(cards, 1):
+            lines += [f"## Card {number}", "", f"**Q:** {card.get('question', '')}", "", f"**A:** {card.get('answer', '')}", ""]
+    return "\n".join(lines)
+
+
+def iter_export_items(user_email: Optional[str] = None, include_chats: bool = True,
+                      include_decks: bool = True, all_decks: bool = False) -> Iterator[Tuple[str, str]]:
+    """
+    Yields (archive path without extension, markdown) for everything to export:
+    the user's chats and the decks served to them. `all_decks` exports every
+    served deck regardless of owner (operator exports from the command line).
+    """
+    if include_chats and user_email:
+        for chat in iter_user_chats(user_email):
+            yield f"chats/{_slug(chat.get('title'))}-{str(chat.get('id', ''))[:8]}", chat_to_markdown(chat)
+    if include_decks and (user_email or all_decks):
+        # Decks that were served to someone; unused pre-warmed ones are skipped
+        query, params = "SELECT id, kind, topic, content, created_at FROM decks WHERE consumed = 1", []
+        if not all_decks:
+            query += " AND owner = ?"
+            params.append(user_email)
+        rows = get_connection().execute(query + " ORDER BY id", params)
+        for row in rows:
+            folder = "quizzes" if row["kind"] == "quiz" else "flashcards"
+            markdown = deck_to_markdown(row["kind"], row["topic"], json.loads(row["content"]), row["created_at"])
+            yield f"{folder}/{_slug(row['topic'])}-{row['id']}", markdown
+
+
+def render_item(name: str, markdown: str, fmt: str) -> Tuple[str, bytes]:
+    """Renders one item to (archive name, file bytes); runs in the worker processes."""
+    if fmt == "docx":
+        from src.md_docx import markdown_to_docx
+        # Chat text is user input: never resolve image paths on the server
+        return f"{name}.docx", markdown_to_docx(markdown, allow_images=False)
+    return f"{name}.md", markdown.encode("utf-8")
+
+
+def write_export(output: Union[str, BinaryIO], items: Iterator[Tuple[str, str]], fmt: str = "docx",
+                 workers: int = EXPORT_WORKERS, progress=None) -> Dict:
+    """
+    Renders `items` and writes them into a ZIP at `output` (a path or a
+    writable binary stream; unseekable streams such as stdout work too).
+    `progress(files_written)` is called after each file.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    started = time.perf_counter()
+    stats = {"files": 0, "bytes": 0}
+
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        def add(rendered: Tuple[str, bytes]):
+            name, content = rendered
+            archive.writestr(name, content)
+            stats["files"] += 1
+            stats["bytes"] += len(content)
+            if progress:
+                progress(stats["files"])
+
+        # Markdown is just an encode; only DOCX rendering is worth the process pool
+        if fmt == "md" or workers <= 1:
+            for name, markdown in items:
+                add(render_item(name, markdown, fmt))
+        else:
+            # Spawned, not forked: the server process is already running threads
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                pending = set()
+                for name, markdown in items:
+                    pending.add(pool.submit(render_item, name, markdown, fmt))
+                    # Bound the items held in memory while the workers catch up
+                    if len(pending) >= workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            add(future.result())
+                for future in wait(pending).done:
+                    add(future.result())
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    return stats
+
+
+# Background jobs. Status lives in a JSON file next to the archive so any
+# worker process can answer status and download requests.
+
+def _status_path(job_id: str) -> str:
+    return os.path.join(EXPORT_DIR, f"{job_id}.json")
+
+
+def archive_path(job_id: str) -> str:
+    return os.path.join(EXPORT_DIR, f"{job_id}.zip")
+
+
+def _save_status(status: Dict):
+    atomic_write_text(_status_path(status["id"]), json.dumps(status))
+
+
+def get_export(job_id: str) -> Optional[Dict]:
+    if not _JOB_ID.match(job_id) or not os.path.exists(_status_path(job_id)):
+        return None
+    with open(_status_path(job_id), "r") as f:
+        return json.load(f)
+
+
+def _remove_expired():
+    cutoff = time.time() - EXPORT_TTL_HOURS * 3600
+    for filename in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, filename)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except FileNotFoundError:
+            # Another worker removed it first
+            pass
+
+
+def _run_export(status: Dict, user_email: Optional[str], include_chats: bool, include_decks: bool):
+    status["status"] = "running"
+    _save_status(status)
+
+    def progress(files: int):
+        status["files"] = files
+        # Rewriting the status file per item would dominate small exports
+        if files % 25 == 0:
+            _save_status(status)
+
+    part_path = archive_path(status["id"]) + ".part"
+    try:
+        stats = write_export(part_path, iter_export_items(user_email, include_chats, include_decks),
+                             status["format"], progress=progress)
+        os.replace(part_path, archive_path(status["id"]))
+        status.update(stats, status="done", finished_at=datetime.datetime.now().isoformat(timespec="seconds"))
+    except Exception as e:
+        print(f"Error exporting {status['id']}: {e}")
+        status.update(status="failed", error=str(e))
+        if os.path.exists(part_path):
+            os.remove(part_path)
+    _save_status(status)
+
+
+def start_export(user_email: Optional[str], fmt: str = "docx", include_chats: bool = True,
+                 include_decks: bool = True) -> Dict:
+    """Queues an export and returns its status record."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    _remove_expired()
+    status = {
+        "id": uuid.uuid4().hex,
+        "status": "queued",
+        "format": fmt,
+        "user_email": user_email,
+        "files": 0,
+        "error": None,
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+    }
+    _save_status(status)
+    _job_executor.submit(_run_export, dict(status), user_email, include_chats, include_decks)
+    return status
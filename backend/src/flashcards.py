@@ -1,10 +1,13 @@
-from langchain_ollama import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnablePassthrough, RunnableLambda
 from langchain_core.output_parsers import JsonOutputParser
 from pydantic import BaseModel, Field
 from typing import List
 
+from src.models import CHAT_MODEL, chat_model
+from src.prompts import SHARED_PREFIX
+from src.summaries import get_summary_context
+
 def format_docs(docs):
     return "\n\n".join(doc.page_content for doc in docs)
 
@@ -15,25 +18,34 @@ class Flashcard(BaseModel):
 class FlashcardSet(BaseModel):
     flashcards: List[Flashcard]
 
-def get_flashcard_chain(vector_store, llm_model: str = "gpt-oss:120b-cloud"):
+def get_flashcard_chain(vector_store, llm_model: str = CHAT_MODEL):
     """
     Creates and returns a chain for generating flashcards in JSON format.
+    Context comes from the precomputed section summaries when they cover the topic,
+    otherwise from retrieved chunks.
     """
-    retriever = vector_store.as_retriever(search_kwargs={"k": 5})
+    retriever = vector_store.as_retriever(search_kwargs={"k": 5}) if vector_store is not None else None
+
+    def get_context(topic):
+        summary_context = get_summary_context(topic)
+        if summary_context:
+            return summary_context
+        return format_docs(retriever.invoke(topic)) if retriever is not None else ""
     
-    llm = ChatOllama(model=llm_model, temperature=0.5)
+    llm = chat_model(llm_model, temperature=0.5)
 
     parser = JsonOutputParser(pydantic_object=FlashcardSet)
 
-    template = """You are an intelligent tutor helper.
-    Create 10 flashcards based on the following context for the given topic: "{topic}".
+    # Fixed instructions first and the topic last, so the prompt prefix is reusable (see src/prompts.py)
+    template = SHARED_PREFIX + """Your task is to write flashcards from the context below.
+    Make the questions conceptual and the answers concise (1 sentence max).
+    
+    {format_instructions}
     
     Context:
     {context}
     
-    {format_instructions}
-    
-    Make the questions conceptual and the answers concise (1 sentence max).
+    Create 10 flashcards for the topic: "{topic}".
     """
     
     prompt = ChatPromptTemplate.from_template(
@@ -42,7 +54,7 @@ def get_flashcard_chain(vector_store, llm_model: str = "gpt-oss:120b-cloud"):
     )
 
     chain = (
-        {"context": retriever | format_docs, "topic": RunnablePassthrough()}
+        {"context": RunnableLambda(get_context), "topic": RunnablePassthrough()}
         | prompt
         | llm
         | parser
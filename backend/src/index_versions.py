@@ -0,0 +1,433 @@
+"""
+Vector collection versioning and online re-indexing.
+
+Each index version is a separate collection/directory (Chroma or the NumPy
+backend) built with a given embedding model and chunking. The manifest
+records which version is active (serving queries) and which one, if any,
+is being built. A build re-ingests the source files in data/ in the
+background while the active version keeps serving; uploads made during the
+build are written to both. When the build finishes the manifest is
+switched atomically and the old version is garbage collected after a grace
+period.
+"""
+import datetime
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from src.database import DATA_DIR, VECTOR_BACKEND, get_chroma_client, get_vector_store, add_documents_to_store
+from src.documents import add_document_chunks, drop_version_chunks, remove_document_chunks
+from src.locks import file_lock
+
+INDEX_ROOT = os.getenv("INDEX_ROOT", ".")
+MANIFEST_PATH = os.path.join(INDEX_ROOT, "index_manifest.json")
+
+# Seconds to keep a retired version around so in-flight requests can finish
+GC_GRACE_SECONDS = float(os.getenv("INDEX_GC_GRACE_SECONDS", "60"))
+
+# Files in data/ that are not course material
+NON_SOURCE_SUFFIXES = (".db", ".db-wal", ".db-shm", ".jsonl", ".prof")
+
+# start_reindex argument default meaning "same as the active version"; None means adaptive chunking
+INHERIT = object()
+
+DEFAULT_VERSION = "v3"
+DEFAULT_VERSION_CONFIG = {
+    "collection_name": "rag_collection_v3",
+    "persist_directory": "./chroma_db_v3",
+    "embedding_model": "nomic-embed-text",
+    # None means per-document-type adaptive chunking (see src/ingestion.py)
+    "chunk_size": None,
+    "chunk_overlap": None,
+    "backend": VECTOR_BACKEND,
+}
+
+
+def is_source_file(filename: str) -> bool:
+    """True for uploaded documents, False for databases, logs and hidden files."""
+    return not filename.startswith(".") and not filename.lower().endswith(NON_SOURCE_SUFFIXES)
+
+
+def list_source_files(data_dir: str = DATA_DIR) -> List[str]:
+    if not os.path.exists(data_dir):
+        return []
+    paths = []
+    for filename in sorted(os.listdir(data_dir)):
+        path = os.path.join(data_dir, filename)
+        if os.path.isfile(path) and is_source_file(filename):
+            paths.append(path)
+    return paths
+
+
+class RateLimiter:
+    """Blocks so that no more than `rate` units are consumed per second on average."""
+
+    def __init__(self, rate: Optional[float]):
+        self.rate = rate
+        self._next = time.monotonic()
+
+    def consume(self, units: int):
+        if not self.rate:
+            return
+        now = time.monotonic()
+        self._next = max(self._next, now) + units / self.rate
+        delay = self._next - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class IndexManager:
+    """Owns the manifest and the open stores for the active and building versions."""
+
+    def __init__(self, manifest_path: str = MANIFEST_PATH):
+        self.manifest_path = manifest_path
+        self._lock = threading.RLock()
+        self._stores: Dict[str, object] = {}
+        self._manifest = None
+        self._manifest_mtime = None
+        self._job: Optional[Dict] = None
+        self._cancel = threading.Event()
+
+    # Manifest
+
+    def _default_manifest(self) -> Dict:
+        now = datetime.datetime.now().isoformat()
+        return {
+            "active": DEFAULT_VERSION,
+            "building": None,
+            "versions": {DEFAULT_VERSION: dict(DEFAULT_VERSION_CONFIG, status="active", created_at=now)},
+        }
+
+    def manifest(self) -> Dict:
+        """Returns the manifest, re-reading it if another process has switched versions."""
+        with self._lock:
+            mtime = os.path.getmtime(self.manifest_path) if os.path.exists(self.manifest_path) else None
+            if self._manifest is None or mtime != self._manifest_mtime:
+                if mtime is None:
+                    self._manifest = self._default_manifest()
+                else:
+                    with open(self.manifest_path, "r") as f:
+                        self._manifest = json.load(f)
+                self._manifest_mtime = mtime
+            return self._manifest
+
+    def _save_manifest(self, manifest: Dict):
+        # Write-then-rename so readers never see a half-written manifest
+        os.makedirs(os.path.dirname(os.path.abspath(self.manifest_path)), exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+        self._manifest = manifest
+        self._manifest_mtime = os.path.getmtime(self.manifest_path)
+
+    # Stores
+
+    def _store(self, version: str):
+        with self._lock:
+            if version not in self._stores:
+                config = self.manifest()["versions"][version]
+                self._stores[version] = get_vector_store(
+                    collection_name=config["collection_name"],
+                    persist_directory=config["persist_directory"],
+                    embedding_model=config["embedding_model"],
+                    backend=config.get("backend", "chroma"),
+                )
+            return self._stores[version]
+
+    def active_version(self) -> str:
+        return self.manifest()["active"]
+
+    def active_store(self):
+        """The store that serves queries."""
+        return self._store(self.active_version())
+
+    def write_targets(self) -> List[Tuple[str, object, Dict]]:
+        """(version, store, config) for every version that new uploads must be written to."""
+        manifest = self.manifest()
+        versions = [manifest["active"]]
+        if manifest.get("building"):
+            versions.append(manifest["building"])
+        return [(v, self._store(v), manifest["versions"][v]) for v in versions]
+
+    def note_ingested(self, filename: str, version: str):
+        """
+        Records in the manifest that an upload is being dual-written to the
+        building `version`, so the build (possibly running in another worker
+        process) skips that file. Call before writing the upload's vectors.
+        """
+        with self._lock, file_lock(self.manifest_path):
+            manifest = self.manifest()
+            config = manifest["versions"].get(version)
+            if config is None or filename in config.get("dual_written", []):
+                return
+            manifest = json.loads(json.dumps(manifest))
+            manifest["versions"][version].setdefault("dual_written", []).append(filename)
+            self._save_manifest(manifest)
+
+    def _dual_written(self, version: str, filename: str) -> bool:
+        config = self.manifest()["versions"].get(version) or {}
+        return filename in config.get("dual_written", [])
+
+    # Re-indexing
+
+    def _job_running(self) -> bool:
+        return self._job is not None and self._job["finished_at"] is None
+
+    def _builder_alive(self, config: Dict) -> bool:
+        """False if the process that started building `config` is gone."""
+        builder = config.get("builder") or {}
+        if builder.get("host") != socket.gethostname():
+            # Another machine sharing the index directory; nothing to check it with
+            return bool(builder)
+        if builder.get("pid") == os.getpid():
+            # Also covers a restart that reused the pid (e.g. pid 1 in a container)
+            return self._job_running()
+        try:
+            os.kill(builder["pid"], 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def recover_stale_build(self) -> Optional[str]:
+        """
+        Abandons a version left "building" by a process that no longer runs
+        (e.g. the server restarted mid re-index). Otherwise uploads would keep
+        dual-writing to it and no new re-index could start. Returns the version.
+        """
+        manifest = self.manifest()
+        version = manifest.get("building")
+        if not version or self._builder_alive(manifest["versions"][version]):
+            return None
+        print(f"Abandoning index version {version}: its re-index is no longer running")
+        self._abandon(version)
+        return version
+
+    def start_reindex(self, embedding_model: str = None, chunk_size=INHERIT, chunk_overlap=INHERIT,
+                      batch_size: int = 64, max_chunks_per_s: Optional[float] = None, backend: str = None) -> Dict:
+        """
+        Starts building a new version in the background and returns its job
+        status. chunk_size/chunk_overlap default to the active version's; pass
+        None for per-document-type adaptive chunking.
+        """
+        self.recover_stale_build()
+        # The file lock makes the check-and-set safe against other worker processes
+        with self._lock, file_lock(self.manifest_path):
+            manifest = self.manifest()
+            if manifest.get("building"):
+                raise RuntimeError(f"Version {manifest['building']} is already being built")
+
+            active = manifest["versions"][manifest["active"]]
+            version = f"v{int(time.time())}"
+            config = {
+                "collection_name": f"rag_collection_{version}",
+                "persist_directory": os.path.join(INDEX_ROOT, f"chroma_db_{version}"),
+                "embedding_model": embedding_model or active["embedding_model"],
+                "chunk_size": active.get("chunk_size") if chunk_size is INHERIT else chunk_size,
+                "chunk_overlap": active.get("chunk_overlap") if chunk_overlap is INHERIT else chunk_overlap,
+                "backend": backend or active.get("backend", "chroma"),
+                "status": "building",
+                # Lets other processes (and this one after a restart) tell whether the build is still running
+                "builder": {"host": socket.gethostname(), "pid": os.getpid()},
+                "created_at": datetime.datetime.now().isoformat(),
+            }
+            manifest = json.loads(json.dumps(manifest))
+            manifest["versions"][version] = config
+            manifest["building"] = version
+            self._save_manifest(manifest)
+
+            self._cancel.clear()
+            self._job = {
+                "version": version,
+                "status": "building",
+                "files_total": 0,
+                "files_done": 0,
+                "chunks_written": 0,
+                "started_at": time.time(),
+                "finished_at": None,
+                "error": None,
+            }
+            thread = threading.Thread(
+                target=self._build, args=(version, batch_size, max_chunks_per_s),
+                name=f"reindex-{version}", daemon=True
+            )
+            thread.start()
+            return self.status()
+
+    def cancel_reindex(self) -> bool:
+        """
+        Cancels the version being built. A build running in another worker
+        process is asked to stop through the manifest; one whose process is
+        gone is abandoned right here. Returns False if nothing was building.
+        """
+        if self._job_running():
+            self._cancel.set()
+            return True
+        with self._lock, file_lock(self.manifest_path):
+            manifest = self.manifest()
+            version = manifest.get("building")
+            if not version:
+                return False
+            alive = self._builder_alive(manifest["versions"][version])
+            if alive:
+                manifest = json.loads(json.dumps(manifest))
+                manifest["versions"][version]["cancel_requested"] = True
+                self._save_manifest(manifest)
+        if not alive:
+            self._abandon(version)
+        return True
+
+    def _cancelled(self, version: str) -> bool:
+        if self._cancel.is_set():
+            return True
+        config = self.manifest()["versions"].get(version)
+        return config is None or bool(config.get("cancel_requested"))
+
+    def _build(self, version: str, batch_size: int, max_chunks_per_s: Optional[float]):
+        from src.ingestion import load_document, split_documents
+
+        job = self._job
+        limiter = RateLimiter(max_chunks_per_s)
+        try:
+            store = self._store(version)
+            config = self.manifest()["versions"][version]
+            files = list_source_files()
+            job["files_total"] = len(files)
+
+            for path in files:
+                if self._cancelled(version):
+                    raise InterruptedError("Re-index cancelled")
+                filename = os.path.basename(path)
+                if self._dual_written(version, filename):
+                    job["files_done"] += 1
+                    continue
+                try:
+                    docs = load_document(path)
+                except Exception as e:
+                    print(f"Re-index: skipping {path}: {e}")
+                    job["files_done"] += 1
+                    continue
+                splits = split_documents(docs, chunk_size=config.get("chunk_size"), chunk_overlap=config.get("chunk_overlap"))
+                written = []
+                for i in range(0, len(splits), batch_size):
+                    if self._cancelled(version):
+                        raise InterruptedError("Re-index cancelled")
+                    batch = splits[i:i + batch_size]
+                    limiter.consume(len(batch))
+                    ids = add_documents_to_store(store, batch)
+                    add_document_chunks(filename, version, ids)
+                    written.extend(ids)
+                    job["chunks_written"] += len(batch)
+                if written and self._dual_written(version, filename):
+                    # An upload of this file was dual-written while it was being built; keep only that copy
+                    store.delete(written)
+                    remove_document_chunks(filename, version, written)
+                job["files_done"] += 1
+
+            self._switch(version)
+            job["status"] = "complete"
+        except Exception as e:
+            job["status"] = "cancelled" if isinstance(e, InterruptedError) else "failed"
+            job["error"] = str(e)
+            print(f"Re-index of {version} {job['status']}: {e}")
+            self._abandon(version)
+        finally:
+            job["finished_at"] = time.time()
+
+    def _switch(self, version: str):
+        """Atomically makes `version` the active one and schedules GC of the previous one."""
+        with self._lock, file_lock(self.manifest_path):
+            manifest = json.loads(json.dumps(self.manifest()))
+            previous = manifest["active"]
+            manifest["active"] = version
+            manifest["building"] = None
+            manifest["versions"][version]["status"] = "active"
+            manifest["versions"][previous]["status"] = "retired"
+            self._save_manifest(manifest)
+        print(f"Switched active index from {previous} to {version}")
+        timer = threading.Timer(GC_GRACE_SECONDS, self.garbage_collect, args=(previous,))
+        timer.daemon = True
+        timer.start()
+
+    def _abandon(self, version: str):
+        with self._lock, file_lock(self.manifest_path):
+            manifest = json.loads(json.dumps(self.manifest()))
+            if manifest.get("building") == version:
+                manifest["building"] = None
+            manifest["versions"][version]["status"] = "retired"
+            self._save_manifest(manifest)
+        self.garbage_collect(version)
+
+    def garbage_collect(self, version: str) -> bool:
+        """Deletes a retired version's collection and directory."""
+        with self._lock:
+            manifest = self.manifest()
+            config = manifest["versions"].get(version)
+            if config is None or version in (manifest["active"], manifest.get("building")):
+                return False
+            store = self._stores.pop(version, None)
+        try:
+            if store is None:
+                store = get_vector_store(config["collection_name"], config["persist_directory"], config["embedding_model"], config.get("backend", "chroma"))
+            store.delete_collection()
+        except Exception as e:
+            print(f"Error deleting collection for {version}: {e}")
+        # With a Chroma server the directory may be the server's own data path;
+        # delete_collection() above is all that belongs to this version there
+        if config.get("backend", "chroma") != "chroma" or get_chroma_client() is None:
+            shutil.rmtree(config["persist_directory"], ignore_errors=True)
+
+        with self._lock, file_lock(self.manifest_path):
+            manifest = json.loads(json.dumps(self.manifest()))
+            manifest["versions"].pop(version, None)
+            self._save_manifest(manifest)
+        drop_version_chunks(version)
+        print(f"Garbage collected index version {version}")
+        return True
+
+    # Deletes
+
+    def delete_chunks(self, chunk_ids: Dict[str, List[str]], batch_size: int = 5000) -> int:
+        """Removes chunks ({version: [ids]}) from every version that still exists."""
+        deleted = 0
+        versions = self.manifest()["versions"]
+        for version, ids in chunk_ids.items():
+            if version not in versions or not ids:
+                continue
+            store = self._store(version)
+            for i in range(0, len(ids), batch_size):
+                store.delete(ids=ids[i:i + batch_size])
+            deleted += len(ids)
+        return deleted
+
+    def delete_by_source(self, path: str) -> int:
+        """Removes chunks whose `source` metadata is `path`, for documents without recorded ids."""
+        deleted = 0
+        for version in list(self.manifest()["versions"]):
+            store = self._store(version)
+            ids = store.get(where={"source": path}, include=[])["ids"]
+            if ids:
+                store.delete(ids=ids)
+                deleted += len(ids)
+        return deleted
+
+    def status(self) -> Dict:
+        manifest = self.manifest()
+        job = None
+        if self._job is not None:
+            job = dict(self._job)
+        return {
+            "active": manifest["active"],
+            "building": manifest.get("building"),
+            "versions": manifest["versions"],
+            "job": job,
+        }
+
+
+index_manager = IndexManager()
@@ -1,56 +1,263 @@
-from langchain_community.document_loaders import PyPDFLoader, TextLoader, Docx2txtLoader, CSVLoader, UnstructuredExcelLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from typing import List
+from langchain_text_splitters import RecursiveCharacterTextSplitter, Language
+from typing import Dict, List, Optional
 from langchain_core.documents import Document
 import os
 
-def load_document(file_path: str) -> List[Document]:
+from src.profiler import IngestionProfiler, profile_stage
+
+CODE_EXTENSIONS = ['.py', '.js', '.jsx', '.ts', '.tsx', '.html', '.css', '.java', '.cpp', '.c', '.h', '.json', '.md', '.sql', '.sh', '.bat', '.txt']
+
+# Extensions with a LangChain language-aware splitter (splits on class/function boundaries)
+CODE_LANGUAGES = {
+    '.py': Language.PYTHON,
+    '.js': Language.JS,
+    '.jsx': Language.JS,
+    '.ts': Language.TS,
+    '.tsx': Language.TS,
+    '.html': Language.HTML,
+    '.java': Language.JAVA,
+    '.cpp': Language.CPP,
+    '.c': Language.C,
+    '.h': Language.CPP,
+    '.md': Language.MARKDOWN,
+}
+
+# Separators for prose from PDFs/DOCX, tried in order: markdown-style headings,
+# numbered section headings ("2.3 Ocean Gyres"), ALL-CAPS heading lines,
+# paragraphs, lines, sentences, words.
+HEADING_SEPARATORS = [
+    r"\n(?=#{1,6} )",
+    r"\n(?=(?:\d+\.)+\d*\s+[A-Z])",
+    r"\n(?=[A-Z][A-Z0-9 ,:&\-]{3,}\n)",
+    r"\n\n",
+    r"\n",
+    r"(?<=[.!?])\s+",
+    r" ",
+    r"",
+]
+
+# Per document type chunk size and overlap, in tokens. Overlap mostly helps
+# prose; code splits on definitions and tabular rows stand alone, so they get none.
+# Each value can be overridden with CHUNK_TOKENS_<TYPE> / CHUNK_OVERLAP_<TYPE>.
+CHUNKING_DEFAULTS = {
+    "pdf": (400, 40),
+    "docx": (400, 40),
+    "code": (400, 0),
+    "text": (400, 40),
+    "tabular": (512, 0),
+}
+
+# Savings in the ingestion report are measured against the old fixed 1000/200
+# character split. "estimate" derives it from character counts; "exact" splits
+# and tokenizes every upload a second time to measure it.
+CHUNKING_BASELINE = os.getenv("CHUNKING_BASELINE", "estimate")
+BASELINE_CHUNK_SIZE, BASELINE_CHUNK_OVERLAP = 1000, 200
+
+def _chunking_config(doc_type: str):
+    size, overlap = CHUNKING_DEFAULTS[doc_type]
+    size = int(os.getenv(f"CHUNK_TOKENS_{doc_type.upper()}", size))
+    overlap = int(os.getenv(f"CHUNK_OVERLAP_{doc_type.upper()}", overlap))
+    return size, overlap
+
+# Loaded on first use: tiktoken downloads the encoding the first time, which
+# must not happen at import (or fail the import when offline)
+_encoding = None
+_encoding_loaded = False
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            print(f"tiktoken unavailable, estimating token counts: {e}")
+            _encoding = None
+        _encoding_loaded = True
+    return _encoding
+
+def token_length(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is None:
+        # Roughly 4 characters per token for English text
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def load_document(file_path: str, profiler: Optional[IngestionProfiler] = None) -> List[Document]:
     """
     Loads a document based on its file extension.
-    Supports PDF, TXT, DOCX.
+    Supports PDF (with OCR of scanned pages), TXT, DOCX, CSV and Excel.
+    If a profiler is given, load time, file size and page count are recorded on it.
     """
     ext = os.path.splitext(file_path)[1].lower()
     print(f"Loading document from: {file_path} (Type: {ext})")
     
-    # Map of extensions to loaders
-    code_extensions = ['.py', '.js', '.jsx', '.ts', '.tsx', '.html', '.css', '.java', '.cpp', '.c', '.h', '.json', '.md', '.sql', '.sh', '.bat', '.txt']
+    # Loaders are imported per file type on first use; langchain_community and
+    # unstructured are slow to import and most uploads only need one of them.
     
     if ext == '.pdf':
+        from langchain_community.document_loaders import PyPDFLoader
         loader = PyPDFLoader(file_path)
     elif ext == '.docx':
+        from langchain_community.document_loaders import Docx2txtLoader
         loader = Docx2txtLoader(file_path)
-    elif ext == '.csv':
-        loader = CSVLoader(file_path)
-    elif ext in ['.xlsx', '.xls']:
-        loader = UnstructuredExcelLoader(file_path)
-    elif ext in code_extensions:
+    elif ext in ['.csv', '.xlsx', '.xls']:
+        # Schema, column summaries and row windows instead of one document per row
+        from src.tabular import TableLoader
+        loader = TableLoader(file_path)
+    elif ext in CODE_EXTENSIONS:
         # Treat code/text files as text
+        from langchain_community.document_loaders import TextLoader
         loader = TextLoader(file_path, encoding='utf-8')
     else:
         # Fallback to TextLoader for unknown text-based files, or raise error
         # Trying TextLoader as a fallback for potential other code files
         try:
+            from langchain_community.document_loaders import TextLoader
             loader = TextLoader(file_path, encoding='utf-8')
         except:
              raise ValueError(f"Unsupported file type: {ext}")
 
-    docs = loader.load()
+    with profile_stage(profiler, "load"):
+        docs = loader.load()
+    if ext == '.pdf':
+        # Scanned pages have no text layer; OCR just those (cached per file hash and page)
+        from src.ocr import ocr_missing_pages
+        with profile_stage(profiler, "ocr"):
+            docs = ocr_missing_pages(file_path, docs, profiler)
+    if profiler is not None:
+        profiler.record("bytes", os.path.getsize(file_path))
+        profiler.record("pages", len(docs))
+        profiler.record("source_chars", sum(len(doc.page_content) for doc in docs))
     print(f"Loaded {len(docs)} document(s)")
     if docs:
         print(f"Content preview: {docs[0].page_content[:500]!r}")
     return docs
 
-def split_documents(docs: List[Document], chunk_size: int = 1000, chunk_overlap: int = 200) -> List[Document]:
+def document_type(doc: Document) -> str:
+    """Chunking category for a loaded document, from its source file extension."""
+    ext = os.path.splitext(doc.metadata.get("source", ""))[1].lower()
+    if ext == '.pdf':
+        return "pdf"
+    if ext == '.docx':
+        return "docx"
+    if ext in ('.csv', '.xlsx', '.xls'):
+        return "tabular"
+    if ext in CODE_LANGUAGES or (ext in CODE_EXTENSIONS and ext != '.txt'):
+        return "code"
+    return "text"
+
+def get_splitter(doc_type: str, ext: str = "") -> RecursiveCharacterTextSplitter:
+    """Token-sized splitter for a document type; code files get a language-aware one."""
+    chunk_size, chunk_overlap = _chunking_config(doc_type)
+    if doc_type == "code" and ext in CODE_LANGUAGES:
+        return RecursiveCharacterTextSplitter.from_language(
+            language=CODE_LANGUAGES[ext],
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=token_length
+        )
+    if doc_type in ("pdf", "docx"):
+        return RecursiveCharacterTextSplitter(
+            separators=HEADING_SEPARATORS,
+            is_separator_regex=True,
+            keep_separator=True,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=token_length
+        )
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=token_length
+    )
+
+def _merge_small_chunks(splits: List[Document], min_tokens: int) -> List[Document]:
     """
-    Splits documents into chunks using RecursiveCharacterTextSplitter.
+    Folds chunks shorter than min_tokens (typically a lone heading line) into the
+    chunk that follows them, so headings stay with their section and don't cost
+    an embedding of their own.
+    """
+    merged = []
+    carry = None
+    for split in splits:
+        if carry is not None:
+            split.page_content = carry.page_content + "\n" + split.page_content
+            carry = None
+        if token_length(split.page_content) < min_tokens:
+            carry = split
+        else:
+            merged.append(split)
+    if carry is not None:
+        merged.append(carry)
+    return merged
+
+def _record_baseline(profiler: IngestionProfiler, docs: List[Document], splits: List[Document], embedded_tokens: int):
+    if CHUNKING_BASELINE == "exact":
+        baseline = RecursiveCharacterTextSplitter(
+            chunk_size=BASELINE_CHUNK_SIZE, chunk_overlap=BASELINE_CHUNK_OVERLAP
+        ).split_documents(docs)
+        profiler.record("baseline_chunks", len(baseline))
+        profiler.record("baseline_embedded_tokens", sum(token_length(split.page_content) for split in baseline))
+        return
+    # A full-size window advances by size - overlap characters, and every chunk
+    # after the first repeats `overlap` of them
+    step = BASELINE_CHUNK_SIZE - BASELINE_CHUNK_OVERLAP
+    chunks = baseline_chars = 0
+    for doc in docs:
+        length = len(doc.page_content.strip())
+        if not length:
+            continue
+        count = max(1, -(-(length - BASELINE_CHUNK_OVERLAP) // step))
+        chunks += count
+        baseline_chars += length + (count - 1) * BASELINE_CHUNK_OVERLAP
+    # Same text, so the same tokens-per-character ratio as the real chunks
+    split_chars = sum(len(split.page_content) for split in splits)
+    profiler.record("baseline_chunks", chunks)
+    profiler.record("baseline_embedded_tokens", round(embedded_tokens * baseline_chars / split_chars) if split_chars else 0)
+    profiler.record("baseline_estimated", True)
+
+def split_documents(docs: List[Document], chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None, profiler: Optional[IngestionProfiler] = None) -> List[Document]:
+    """
+    Splits documents into chunks.
+    By default each document type gets its own token-sized strategy (see CHUNKING_DEFAULTS).
+    Passing chunk_size/chunk_overlap uses a fixed character-based RecursiveCharacterTextSplitter instead.
+    With a profiler, chunk counts are also recorded for the old fixed 1000/200 split so the saving shows in the report
+    (estimated from character counts unless CHUNKING_BASELINE=exact).
     """
     print("Splitting documents...")
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap
-    )
-    splits = text_splitter.split_documents(docs)
+    with profile_stage(profiler, "split"):
+        if chunk_size is not None:
+            text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=chunk_size,
+                chunk_overlap=200 if chunk_overlap is None else chunk_overlap
+            )
+            splits = text_splitter.split_documents(docs)
+            strategies = {"fixed": len(splits)}
+        else:
+            splits = []
+            strategies: Dict[str, int] = {}
+            for doc in docs:
+                doc_type = document_type(doc)
+                ext = os.path.splitext(doc.metadata.get("source", ""))[1].lower()
+                if doc.metadata.get("table_kind") == "rows":
+                    # Row windows are already sized to one chunk by src.tabular
+                    doc_splits = [doc]
+                else:
+                    doc_splits = get_splitter(doc_type, ext).split_documents([doc])
+                if doc_type in ("pdf", "docx"):
+                    doc_splits = _merge_small_chunks(doc_splits, _chunking_config(doc_type)[0] // 8)
+                for split in doc_splits:
+                    split.metadata["chunking"] = doc_type
+                splits.extend(doc_splits)
+                strategies[doc_type] = strategies.get(doc_type, 0) + len(doc_splits)
+
+    if profiler is not None:
+        profiler.record("chunks", len(splits))
+        profiler.record("chars", sum(len(split.page_content) for split in splits))
+        profiler.record("chunking", strategies)
+        embedded_tokens = sum(token_length(split.page_content) for split in splits)
+        profiler.record("embedded_tokens", embedded_tokens)
+        _record_baseline(profiler, docs, splits, embedded_tokens)
     print(f"Created {len(splits)} chunks")
     return splits
-
-
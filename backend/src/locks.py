@@ -0,0 +1,93 @@
+import os
+import threading
+from contextlib import contextmanager
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+# flock/msvcrt locks are per process; this serializes threads of the same process too
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _thread_lock(path: str) -> threading.Lock:
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(path, threading.Lock())
+
+
+def _acquire(f):
+    if os.name == "nt":
+        f.seek(0)
+        # LK_LOCK retries for ~10s before raising; loop so long waits still succeed
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                break
+            except OSError:
+                continue
+    else:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+
+def _release(f):
+    if os.name == "nt":
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _is_current(f, lock_path: str) -> bool:
+    """False if the lock file was removed (see `remove_lock`) while we waited for it."""
+    if os.name == "nt":
+        return True
+    try:
+        return os.stat(lock_path).st_ino == os.fstat(f.fileno()).st_ino
+    except FileNotFoundError:
+        return False
+
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Exclusive lock shared across threads and processes, held on `<path>.lock`.
+    Used around read-modify-write of JSON files when running several workers.
+    """
+    lock_path = path + ".lock"
+    os.makedirs(os.path.dirname(os.path.abspath(lock_path)), exist_ok=True)
+    with _thread_lock(lock_path):
+        while True:
+            f = open(lock_path, "a+b")
+            _acquire(f)
+            if _is_current(f, lock_path):
+                break
+            # Locked a file that was removed meanwhile; lock the new one instead
+            _release(f)
+            f.close()
+        try:
+            yield
+        finally:
+            _release(f)
+            f.close()
+
+
+def remove_lock(path: str):
+    """
+    Deletes `<path>.lock` along with the file it guards; call while holding
+    `file_lock(path)`. Processes waiting on the old lock file notice and retry.
+    """
+    try:
+        os.remove(path + ".lock")
+    except OSError:
+        # Already gone, or Windows refusing to delete an open file
+        pass
+
+
+def atomic_write_text(path: str, text: str):
+    """Writes via a temp file and rename so readers never see a partial file."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
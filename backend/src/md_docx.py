@@ -0,0 +1,86 @@
+"""
+Markdown to DOCX conversion, line by line: headings, images, bullet and
+numbered lists, fenced code and paragraphs with **bold** spans.
+
+Used by scripts/md_to_docx.py and by the bulk exporter (src/exports.py),
+whose process-pool workers call `markdown_to_docx` directly.
+"""
+import io
+import os
+import re
+
+BOLD = re.compile(r"\*\*(.+?)\*\*")
+
+
+def _add_text(paragraph, text: str):
+    position = 0
+    for match in BOLD.finditer(text):
+        paragraph.add_run(text[position:match.start()])
+        paragraph.add_run(match.group(1)).bold = True
+        position = match.end()
+    paragraph.add_run(text[position:])
+
+
+def markdown_to_docx(markdown: str, base_dir: str = None, allow_images: bool = True) -> bytes:
+    """
+    Converts Markdown text to the bytes of a .docx file. With allow_images=False
+    image lines are kept as text, so untrusted Markdown (chat messages) can't
+    pull arbitrary server files into the document.
+    """
+    from docx import Document
+    from docx.shared import Inches, Pt
+
+    doc = Document()
+    in_code = False
+
+    for raw_line in markdown.splitlines():
+        line = raw_line.strip()
+        if line.startswith("```"):
+            in_code = not in_code
+            continue
+        if in_code:
+            run = doc.add_paragraph().add_run(raw_line.rstrip())
+            run.font.name = "Courier New"
+            run.font.size = Pt(9)
+            continue
+        if not line:
+            continue
+
+        # Headings
+        if line.startswith('# '):
+            doc.add_heading(line[2:], level=1)
+        elif line.startswith('## '):
+            doc.add_heading(line[3:], level=2)
+        elif line.startswith('### '):
+            doc.add_heading(line[4:], level=3)
+
+        # Images: ![caption](path)
+        elif line.startswith('![') and not allow_images:
+            _add_text(doc.add_paragraph(), line)
+        elif line.startswith('!['):
+            match = re.match(r'!\[(.*?)\]\((.*?)\)', line)
+            if match:
+                caption = match.group(1)
+                # Remove file:/// prefix if exists
+                img_path = match.group(2).replace('file:///', '')
+                if base_dir and not os.path.isabs(img_path):
+                    img_path = os.path.join(base_dir, img_path)
+                if os.path.exists(img_path):
+                    doc.add_picture(img_path, width=Inches(6))
+                    doc.add_paragraph(caption, style='Caption')
+                else:
+                    doc.add_paragraph(f"[Image Missing: {caption}]")
+
+        # Lists
+        elif line.startswith('- ') or line.startswith('* '):
+            _add_text(doc.add_paragraph(style='List Bullet'), line[2:])
+        elif re.match(r'^\d+\.', line):
+            _add_text(doc.add_paragraph(style='List Number'), re.sub(r'^\d+\.\s*', '', line))
+
+        # Plain text
+        else:
+            _add_text(doc.add_paragraph(), line)
+
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
@@ -0,0 +1,182 @@
+"""
+Model lifecycle: warm-up at startup, keep_alive policy and keep-warm pings.
+
+Ollama unloads a model once its keep_alive expires, and the next request pays
+the full load. At startup the chat and embedding models are loaded, and the
+shared prompt prefix (src/prompts.py) is evaluated once so its KV cache is
+ready. During business hours a background thread pings the models before
+keep_alive runs out. Outside those hours they are left to expire, which frees
+memory overnight.
+
+Chat models should be created with `chat_model()` and embeddings with
+`embedding_model()` so every request carries the keep_alive that is current
+for the time of day.
+"""
+import datetime
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import httpx
+
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", os.getenv("OLLAMA_HOST", "http://localhost:11434"))
+if not OLLAMA_BASE_URL.startswith("http"):
+    OLLAMA_BASE_URL = f"http://{OLLAMA_BASE_URL}"
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-oss:120b-cloud")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "nomic-embed-text")
+
+WARMUP_ON_STARTUP = os.getenv("MODEL_WARMUP", "1") == "1"
+# keep_alive sent with requests during / outside business hours (Ollama duration strings)
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+OFF_HOURS_KEEP_ALIVE = os.getenv("OLLAMA_OFF_HOURS_KEEP_ALIVE", "5m")
+KEEP_WARM_INTERVAL_S = float(os.getenv("KEEP_WARM_INTERVAL_S", "600"))
+# Business hours as "start-end" local hours and weekdays (0 = Monday)
+KEEP_WARM_HOURS = os.getenv("KEEP_WARM_HOURS", "8-20")
+KEEP_WARM_DAYS = os.getenv("KEEP_WARM_DAYS", "0-4")
+
+
+def in_business_hours(now: Optional[datetime.datetime] = None) -> bool:
+    now = now or datetime.datetime.now()
+    start_hour, end_hour = (int(h) for h in KEEP_WARM_HOURS.split("-"))
+    first_day, last_day = (int(d) for d in KEEP_WARM_DAYS.split("-"))
+    return first_day <= now.weekday() <= last_day and start_hour <= now.hour < end_hour
+
+
+def current_keep_alive() -> str:
+    return KEEP_ALIVE if in_business_hours() else OFF_HOURS_KEEP_ALIVE
+
+
+def keep_alive_seconds(duration) -> int:
+    """Ollama duration ("30m", "1h", "90s", "300", "-1") in seconds; OllamaEmbeddings only takes ints."""
+    text = str(duration).strip().lower()
+    units = {"s": 1, "m": 60, "h": 3600}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(float(text))
+
+
+def chat_model(model: str = CHAT_MODEL, **kwargs):
+    """ChatOllama with the current keep_alive policy."""
+    from langchain_ollama import ChatOllama
+    return ChatOllama(model=model, keep_alive=current_keep_alive(), **kwargs)
+
+
+_embeddings_class = None
+
+
+def embedding_model(model: str = EMBEDDING_MODEL):
+    """
+    OllamaEmbeddings that picks up the current keep_alive on every call. The
+    vector store keeps one embeddings object for the life of the process, so
+    a value fixed at construction would never follow the business-hours policy.
+    """
+    global _embeddings_class
+    if _embeddings_class is None:
+        from langchain_ollama import OllamaEmbeddings
+
+        class PolicyOllamaEmbeddings(OllamaEmbeddings):
+            # embed_query/aembed_query go through these two
+            def embed_documents(self, texts):
+                self.keep_alive = keep_alive_seconds(current_keep_alive())
+                return super().embed_documents(texts)
+
+            async def aembed_documents(self, texts):
+                self.keep_alive = keep_alive_seconds(current_keep_alive())
+                return await super().aembed_documents(texts)
+
+        _embeddings_class = PolicyOllamaEmbeddings
+    return _embeddings_class(model=model, keep_alive=keep_alive_seconds(current_keep_alive()))
+
+
+class ModelManager:
+    """Loads models ahead of use and keeps them resident during business hours."""
+
+    def __init__(self, base_url: str = OLLAMA_BASE_URL, chat: str = CHAT_MODEL, embedding: str = EMBEDDING_MODEL):
+        self.base_url = base_url.rstrip("/")
+        self.chat = chat
+        self.embedding = embedding
+        self._stop = threading.Event()
+        self._thread = None
+        self._status = {"chat": {}, "embedding": {}, "last_ping": None, "pings": 0}
+
+    def _post(self, path: str, payload: Dict, timeout: float = 300.0) -> Dict:
+        with httpx.Client(base_url=self.base_url, timeout=timeout) as client:
+            response = client.post(path, json=payload)
+            response.raise_for_status()
+            return response.json()
+
+    def load_chat(self, prefix: Optional[str] = None) -> float:
+        """
+        Loads the chat model and returns the seconds it took. With `prefix`, the
+        prompt prefix is also evaluated (one output token) so its KV cache is warm.
+        """
+        from src.prompts import SHARED_PREFIX
+
+        started = time.perf_counter()
+        payload = {"model": self.chat, "keep_alive": current_keep_alive(), "stream": False}
+        if prefix is None:
+            prefix = SHARED_PREFIX
+        if prefix:
+            payload.update(prompt=prefix, options={"num_predict": 1})
+        else:
+            # An empty prompt only loads the model
+            payload["prompt"] = ""
+        self._post("/api/generate", payload)
+        return time.perf_counter() - started
+
+    def load_embedding(self) -> float:
+        started = time.perf_counter()
+        self._post("/api/embed", {"model": self.embedding, "input": "warm-up", "keep_alive": current_keep_alive()})
+        return time.perf_counter() - started
+
+    def unload(self):
+        """Evicts both models (keep_alive 0); used by the cold-start benchmark."""
+        self._post("/api/generate", {"model": self.chat, "prompt": "", "keep_alive": 0, "stream": False})
+        self._post("/api/embed", {"model": self.embedding, "input": "", "keep_alive": 0})
+
+    def warm_up(self) -> Dict:
+        for kind, load in (("embedding", self.load_embedding), ("chat", self.load_chat)):
+            try:
+                seconds = load()
+                self._status[kind] = {"model": getattr(self, kind), "loaded": True, "load_s": round(seconds, 3), "error": None}
+                print(f"Warmed {kind} model {getattr(self, kind)} in {seconds:.2f}s")
+            except Exception as e:
+                self._status[kind] = {"model": getattr(self, kind), "loaded": False, "error": str(e)}
+                print(f"Error warming {kind} model {getattr(self, kind)}: {e}")
+        return self.status()
+
+    def _keep_warm_loop(self):
+        if WARMUP_ON_STARTUP:
+            self.warm_up()
+        while not self._stop.wait(KEEP_WARM_INTERVAL_S):
+            if not in_business_hours():
+                continue
+            try:
+                self.load_embedding()
+                # Re-evaluating the shared prefix also keeps it in the KV cache
+                self.load_chat()
+                self._status["last_ping"] = datetime.datetime.now().isoformat(timespec="seconds")
+                self._status["pings"] += 1
+            except Exception as e:
+                print(f"Keep-warm ping failed: {e}")
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._keep_warm_loop, name="model-keep-warm", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self) -> Dict:
+        return dict(
+            self._status,
+            business_hours=in_business_hours(),
+            keep_alive=current_keep_alive(),
+            keep_warm_interval_s=KEEP_WARM_INTERVAL_S,
+        )
+
+
+model_manager = ModelManager()
@@ -0,0 +1,145 @@
+"""
+OCR for scanned PDFs.
+
+PyPDFLoader returns one document per page with whatever text layer the page
+has; scanned pages come back empty. `ocr_missing_pages` finds pages whose
+text layer is (nearly) empty, rasterizes only those pages and runs Tesseract
+on them in a process pool. Results are cached in SQLite per (file hash, page,
+OCR settings), so re-ingesting the same file or rebuilding the index with new
+chunking never OCRs a page twice.
+
+Needs the optional pytesseract and pdf2image packages plus the tesseract and
+poppler binaries; without them, PDFs load as before and a warning is printed.
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+from langchain_core.documents import Document
+
+# "auto" OCRs pages without a usable text layer, "force" every page, "off" none
+OCR_MODE = os.getenv("OCR_MODE", "auto")
+# Pages with fewer non-whitespace characters than this are treated as scanned
+OCR_MIN_CHARS = int(os.getenv("OCR_MIN_CHARS", "25"))
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+OCR_DPI = int(os.getenv("OCR_DPI", "300"))
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+
+
+def ocr_available() -> bool:
+    try:
+        import pytesseract  # noqa: F401
+        import pdf2image  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def needs_ocr(doc: Document) -> bool:
+    return len("".join(doc.page_content.split())) < OCR_MIN_CHARS
+
+
+def _settings_key() -> str:
+    return f"tesseract:{OCR_LANG}:{OCR_DPI}"
+
+
+def ocr_page(file_path: str, page: int, dpi: int = OCR_DPI, lang: str = OCR_LANG) -> Tuple[int, str, float]:
+    """Rasterizes one page (0-based) and OCRs it; runs in the worker processes."""
+    import pytesseract
+    from pdf2image import convert_from_path
+
+    started = time.perf_counter()
+    images = convert_from_path(file_path, dpi=dpi, first_page=page + 1, last_page=page + 1)
+    text = "\n".join(pytesseract.image_to_string(image, lang=lang) for image in images)
+    return page, text, time.perf_counter() - started
+
+
+def _cached_pages(file_hash: str, pages: List[int]) -> Dict[int, str]:
+    from src.database import get_connection
+
+    if not pages:
+        return {}
+    placeholders = ",".join("?" * len(pages))
+    rows = get_connection().execute(
+        f"SELECT page, text FROM ocr_pages WHERE file_hash = ? AND settings = ? AND page IN ({placeholders})",
+        [file_hash, _settings_key()] + pages
+    ).fetchall()
+    return {row["page"]: row["text"] for row in rows}
+
+
+def _cache_page(file_hash: str, page: int, text: str, seconds: float):
+    from src.database import get_connection
+
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO ocr_pages (file_hash, page, settings, text, seconds) VALUES (?, ?, ?, ?, ?)",
+            (file_hash, page, _settings_key(), text, seconds)
+        )
+
+
+def ocr_missing_pages(file_path: str, docs: List[Document], profiler=None, mode: str = None,
+                      workers: int = OCR_WORKERS) -> List[Document]:
+    """
+    Fills in the text of scanned pages of a PDF loaded with PyPDFLoader.
+    OCR'd pages get metadata["ocr"] = True. A page whose OCR fails keeps its
+    text layer and is listed in the "ocr_failed_pages" profiler counter. Page
+    counts and pages/sec are recorded on the profiler and printed.
+    """
+    mode = mode or OCR_MODE
+    if mode == "off" or not docs:
+        return docs
+    targets = [i for i, doc in enumerate(docs) if mode == "force" or needs_ocr(doc)]
+    if not targets:
+        return docs
+    if not ocr_available():
+        print(f"{len(targets)} page(s) of {os.path.basename(file_path)} have no text layer, "
+              f"but OCR is unavailable (install pytesseract and pdf2image)")
+        return docs
+
+    from src.documents import file_sha256
+
+    started = time.perf_counter()
+    file_hash = file_sha256(file_path)
+    pages = [docs[i].metadata.get("page", i) for i in targets]
+    texts = _cached_pages(file_hash, pages)
+    missing = [p for p in pages if p not in texts]
+
+    ocr_seconds = 0.0
+    failed = []
+    if missing:
+        # Pages are independent; a process per core keeps Tesseract busy. Spawned,
+        # not forked: the server process already runs threads that fork would copy mid-state.
+        with ProcessPoolExecutor(max_workers=max(1, min(workers, len(missing))),
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {pool.submit(ocr_page, file_path, page): page for page in missing}
+            for future, page in futures.items():
+                try:
+                    _, text, seconds = future.result()
+                except Exception as e:
+                    print(f"OCR failed for page {page + 1} of {os.path.basename(file_path)}: {e}")
+                    failed.append({"page": page, "error": str(e)})
+                    continue
+                texts[page] = text
+                ocr_seconds += seconds
+                _cache_page(file_hash, page, text, seconds)
+
+    for i, page in zip(targets, pages):
+        if page in texts:
+            docs[i].page_content = texts[page]
+            docs[i].metadata["ocr"] = True
+
+    elapsed = time.perf_counter() - started
+    done = len(missing) - len(failed)
+    pages_per_s = round(done / elapsed, 2) if done and elapsed else None
+    if profiler is not None:
+        profiler.record("ocr_pages", done)
+        profiler.record("ocr_failed_pages", failed)
+        profiler.record("ocr_cached_pages", len(pages) - len(missing))
+        profiler.record("ocr_pages_per_s", pages_per_s)
+        profiler.record("ocr_worker_s", round(ocr_seconds, 3))
+    print(f"OCR {os.path.basename(file_path)}: {done} page(s) OCR'd, {len(failed)} failed, "
+          f"{len(pages) - len(missing)} from cache, {pages_per_s or '-'} pages/s")
+    return docs
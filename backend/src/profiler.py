@@ -0,0 +1,351 @@
+import cProfile
+import datetime
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data")
+REPORTS_DIR = os.path.join(DATA_DIR, "ingestion_reports")
+# Reports are stored in the ingestion_reports table; this is the old append-only log,
+# imported into the table once by `import_legacy_reports`
+REPORTS_FILE = os.path.join(REPORTS_DIR, "reports.jsonl")
+PROFILES_DIR = os.path.join(REPORTS_DIR, "profiles")
+
+# Ingestions slower than this (seconds, wall clock) get their cProfile stats dumped.
+# Profiling is only active when the threshold is set.
+PROFILE_THRESHOLD = float(os.getenv("INGEST_PROFILE_THRESHOLD", "0") or 0)
+# Interval of the RSS sampling while an ingestion runs
+RSS_SAMPLE_S = float(os.getenv("INGEST_RSS_SAMPLE_S", "0.05"))
+
+# cProfile can only have one active profiler per interpreter, so concurrent
+# ingestions skip profiling while another one holds it.
+_profile_lock = threading.Lock()
+
+
+def _peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process, or None if it can't be measured."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KiB, macOS reports bytes
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        # Windows exposes the peak working set directly
+        return getattr(info, "peak_wset", info.rss)
+    except ImportError:
+        return None
+
+
+def current_rss_bytes() -> Optional[int]:
+    """Current resident set size of this process, or None if it can't be measured."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+class _RssSampler:
+    """
+    Samples RSS in a background thread between start() and stop(). ru_maxrss
+    is the peak over the whole process lifetime, so after one large upload it
+    would say nothing about later ones. Uploads running concurrently in the
+    same process still share these numbers.
+    """
+
+    def __init__(self, interval: float = RSS_SAMPLE_S):
+        self.interval = interval
+        self.start_bytes = None
+        self.peak_bytes = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        rss = current_rss_bytes()
+        if rss is not None and (self.peak_bytes is None or rss > self.peak_bytes):
+            self.peak_bytes = rss
+        return rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self.start_bytes = self._sample()
+        if self.start_bytes is not None:
+            self._thread = threading.Thread(target=self._run, name="ingest-rss", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> Dict[str, Optional[int]]:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        end = self._sample()
+        start = self.start_bytes
+        return {
+            "rss_start_bytes": start,
+            "rss_end_bytes": end,
+            "rss_delta_bytes": end - start if start is not None and end is not None else None,
+            # Highest sampled RSS during this ingestion and its growth over the starting RSS
+            "peak_rss_bytes": self.peak_bytes,
+            "peak_rss_delta_bytes": self.peak_bytes - start if start is not None and self.peak_bytes is not None else None,
+        }
+
+
+class IngestionProfiler:
+    """
+    Collects per-stage timings and sizes for a single file ingestion.
+    Stages are timed with `stage()`, counters are set with `record()`.
+    """
+
+    def __init__(self, file_path: str, profile_threshold: float = PROFILE_THRESHOLD):
+        self.report_id = str(uuid.uuid4())
+        self.file_path = file_path
+        self.filename = os.path.basename(file_path)
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, float] = {}
+        self.profile_threshold = profile_threshold
+        self._profile = cProfile.Profile() if profile_threshold > 0 else None
+        self._started_wall = None
+        self._started_cpu = None
+        self._rss = _RssSampler()
+        self.report: Optional[Dict] = None
+
+    def start(self):
+        self._started_wall = time.perf_counter()
+        self._started_cpu = time.process_time()
+        self._rss.start()
+        if self._profile is not None:
+            if _profile_lock.acquire(blocking=False):
+                self._profile.enable()
+            else:
+                self._profile = None
+        return self
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a named stage. Re-entering a stage accumulates its totals."""
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            entry = self.stages.setdefault(name, {"wall_s": 0.0, "cpu_s": 0.0})
+            entry["wall_s"] += time.perf_counter() - wall_start
+            entry["cpu_s"] += time.process_time() - cpu_start
+
+    def add_stage_time(self, name: str, wall_s: float, cpu_s: float = 0.0):
+        """Add time measured elsewhere (e.g. inside a wrapped embedding call)."""
+        entry = self.stages.setdefault(name, {"wall_s": 0.0, "cpu_s": 0.0})
+        entry["wall_s"] += wall_s
+        entry["cpu_s"] += cpu_s
+
+    def record(self, key: str, value):
+        self.counters[key] = value
+
+    def finish(self, status: str = "ok", error: str = None) -> Dict:
+        """Build the report, persist it and dump the profile if this run was an outlier."""
+        if self._profile is not None:
+            self._profile.disable()
+            _profile_lock.release()
+
+        wall_total = time.perf_counter() - self._started_wall if self._started_wall else 0.0
+        cpu_total = time.process_time() - self._started_cpu if self._started_cpu else 0.0
+        memory = self._rss.stop()
+
+        embed = self.stages.get("embed", {})
+        chunks = self.counters.get("chunks", 0)
+        chars = self.counters.get("chars", 0)
+        embed_wall = embed.get("wall_s", 0.0)
+
+        report = {
+            "id": self.report_id,
+            "filename": self.filename,
+            "status": status,
+            "error": error,
+            "created_at": datetime.datetime.now().isoformat(),
+            "bytes": self.counters.get("bytes"),
+            "pages": self.counters.get("pages"),
+            "chunks": chunks,
+            "counters": self.counters,
+            "stages": {name: {k: round(v, 4) for k, v in times.items()} for name, times in self.stages.items()},
+            "wall_s": round(wall_total, 4),
+            "cpu_s": round(cpu_total, 4),
+            **memory,
+            "embedding_throughput": {
+                "chunks_per_s": round(chunks / embed_wall, 2) if embed_wall else None,
+                "chars_per_s": round(chars / embed_wall, 2) if embed_wall else None,
+            },
+            "profile_path": None,
+        }
+
+        if self._profile is not None and wall_total >= self.profile_threshold:
+            os.makedirs(PROFILES_DIR, exist_ok=True)
+            profile_path = os.path.join(PROFILES_DIR, f"{self.report_id}.prof")
+            self._profile.dump_stats(profile_path)
+            report["profile_path"] = profile_path
+            print(f"Ingestion of {self.filename} took {wall_total:.1f}s, profile saved to {profile_path}")
+
+        save_report(report)
+        self.report = report
+        return report
+
+
+@contextmanager
+def profile_stage(profiler: Optional[IngestionProfiler], name: str):
+    """`profiler.stage(name)` that is a no-op when no profiler is attached."""
+    if profiler is None:
+        yield
+    else:
+        with profiler.stage(name):
+            yield
+
+
+_active = threading.local()
+
+
+@contextmanager
+def attach_profiler(profiler: Optional[IngestionProfiler]):
+    """Make `profiler` receive embedding timings for calls made on this thread."""
+    previous = getattr(_active, "profiler", None)
+    _active.profiler = profiler
+    try:
+        yield
+    finally:
+        _active.profiler = previous
+
+
+class TimedEmbeddings:
+    """
+    Wraps an embeddings object so embedding time can be separated from the
+    vector store write that triggers it. Timings go to whichever profiler is
+    attached on the calling thread, so one wrapper can serve concurrent uploads.
+    """
+
+    def __init__(self, embeddings):
+        self._embeddings = embeddings
+
+    def embed_documents(self, texts):
+        profiler = getattr(_active, "profiler", None)
+        if profiler is None:
+            return self._embeddings.embed_documents(texts)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            return self._embeddings.embed_documents(texts)
+        finally:
+            profiler.add_stage_time("embed", time.perf_counter() - wall_start, time.process_time() - cpu_start)
+
+    def embed_query(self, text):
+        return self._embeddings.embed_query(text)
+
+    def __getattr__(self, name):
+        return getattr(self._embeddings, name)
+
+
+def save_report(report: Dict):
+    """Stores a report in the ingestion_reports table."""
+    from src.database import get_connection
+
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO ingestion_reports (id, filename, status, created_at, wall_s, report) VALUES (?, ?, ?, ?, ?, ?)",
+            (report["id"], report.get("filename"), report.get("status"), report.get("created_at"),
+             report.get("wall_s"), json.dumps(report))
+        )
+
+
+def import_legacy_reports():
+    """Moves reports from the old JSONL log into the table, once."""
+    if not os.path.exists(REPORTS_FILE):
+        return 0
+    from src.database import get_connection
+    from src.locks import file_lock
+
+    imported = 0
+    with file_lock(REPORTS_FILE):
+        if not os.path.exists(REPORTS_FILE):
+            return 0
+        rows = []
+        with open(REPORTS_FILE, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    report = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if report.get("id"):
+                    rows.append((report["id"], report.get("filename"), report.get("status"), report.get("created_at"),
+                                 report.get("wall_s"), json.dumps(report)))
+        conn = get_connection()
+        with conn:
+            imported = conn.executemany(
+                "INSERT OR IGNORE INTO ingestion_reports (id, filename, status, created_at, wall_s, report) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            ).rowcount
+        os.replace(REPORTS_FILE, REPORTS_FILE + ".imported")
+    print(f"Imported {imported} ingestion report(s) from {REPORTS_FILE}")
+    return imported
+
+
+def get_reports(filename: str = None, limit: int = 50, min_wall_s: float = None) -> List[Dict]:
+    """Return the most recent reports first, optionally filtered by file name or duration."""
+    from src.database import get_connection
+
+    query, params = "SELECT report FROM ingestion_reports WHERE 1 = 1", []
+    if filename:
+        query += " AND filename = ?"
+        params.append(filename)
+    if min_wall_s is not None:
+        query += " AND wall_s >= ?"
+        params.append(min_wall_s)
+    query += " ORDER BY created_at DESC, rowid DESC LIMIT ?"
+    rows = get_connection().execute(query, params + [limit]).fetchall()
+    return [json.loads(row["report"]) for row in rows]
+
+
+def get_report(report_id: str) -> Optional[Dict]:
+    """Look up a single report by id."""
+    from src.database import get_connection
+
+    row = get_connection().execute("SELECT report FROM ingestion_reports WHERE id = ?", (report_id,)).fetchone()
+    return json.loads(row["report"]) if row else None
+
+
+def chunking_summary(filename: str = None, limit: int = 1000) -> Dict:
+    """
+    Chunk and embedded-token counts per document for the adaptive chunking,
+    next to what the fixed 1000/200 character split would have produced.
+    """
+    documents = []
+    totals = {"chunks": 0, "baseline_chunks": 0, "embedded_tokens": 0, "baseline_embedded_tokens": 0}
+    for report in get_reports(filename=filename, limit=limit):
+        counters = report.get("counters", {})
+        if report.get("status") != "ok" or "baseline_chunks" not in counters:
+            continue
+        row = {"filename": report["filename"], "report_id": report["id"], "chunking": counters.get("chunking")}
+        for key in totals:
+            row[key] = counters.get(key, 0)
+            totals[key] += row[key]
+        documents.append(row)
+
+    def saved(new, old):
+        return round(1 - new / old, 4) if old else None
+
+    totals["vectors_saved_ratio"] = saved(totals["chunks"], totals["baseline_chunks"])
+    totals["tokens_saved_ratio"] = saved(totals["embedded_tokens"], totals["baseline_embedded_tokens"])
+    return {"totals": totals, "documents": documents}
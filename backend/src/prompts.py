@@ -0,0 +1,15 @@
+"""
+Shared prompt prefix.
+
+Ollama reuses the KV cache of a prompt's longest common prefix with the
+previous request, so every tutor prompt starts with the same fixed text,
+followed by its own fixed instructions and format rules. The parts that
+change between requests (retrieved context, topic, question) come last.
+Keep anything request-specific out of SHARED_PREFIX: changing it per request
+defeats the cache for every prompt.
+"""
+
+SHARED_PREFIX = """You are TutorLLM, an intelligent tutor assistant that helps students prepare for exams using the study material they upload.
+Be accurate, formal and educational, and base your work on the provided context whenever it is relevant.
+
+"""
@@ -1,10 +1,15 @@
-from langchain_ollama import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnablePassthrough, RunnableLambda
 from langchain_core.output_parsers import JsonOutputParser
 from pydantic import BaseModel, Field
 from typing import List
 
+from src.models import CHAT_MODEL, chat_model
+from src.prompts import SHARED_PREFIX
+from src.summaries import get_summary_context
+
+DEFAULT_QUIZ_PARAMS = {"count": 5, "difficulty": "Medium"}
+
 # Define the expected JSON structure for a Question
 class Question(BaseModel):
     question: str = Field(description="The question text")
@@ -18,30 +23,39 @@ class Quiz(BaseModel):
 def format_docs(docs):
     return "\n\n".join(doc.page_content for doc in docs)
 
-def get_quiz_chain(vector_store, llm_model: str = "gpt-oss:120b-cloud"):
+def get_quiz_chain(vector_store, llm_model: str = CHAT_MODEL):
     """
     Creates a chain to generate quizzes based on context.
+    Context comes from the precomputed section summaries when they cover the topic,
+    otherwise from retrieved chunks.
     """
-    retriever = vector_store.as_retriever(search_kwargs={"k": 5})
-    llm = ChatOllama(model=llm_model, temperature=0.7) # Higher temp for creativity
+    retriever = vector_store.as_retriever(search_kwargs={"k": 5}) if vector_store is not None else None
+
+    def get_context(topic):
+        summary_context = get_summary_context(topic)
+        if summary_context:
+            return summary_context
+        return format_docs(retriever.invoke(topic)) if retriever is not None else ""
+
+    llm = chat_model(llm_model, temperature=0.7) # Higher temp for creativity
     
     # Set up JSON parser
     parser = JsonOutputParser(pydantic_object=Quiz)
     
-    template = """You are an expert exam creator.
-    Generate a quiz with {num_questions} multiple-choice questions (MCQs) about the topic: "{topic}".
-    Difficulty Level: {difficulty}.
-    
+    # Fixed instructions first and the per-request values last, so the prompt prefix is reusable (see src/prompts.py)
+    template = SHARED_PREFIX + """You are also an expert exam creator. Your task is to write a multiple-choice (MCQ) quiz.
     Use the provided context to ensure the questions are accurate and relevant to the material.
-    If the context is insufficient, use your general knowledge but prioritze the context.
+    If the context is insufficient, use your general knowledge but prioritize the context.
+    Make sure to provide exactly 4 options for each question.
+    Ensure each question has a concise 1-line explanation for the correct answer.
+    
+    {format_instructions}
     
     Context:
     {context}
     
-    {format_instructions}
-    
-    Make sure to provide exactly 4 options for each question.
-    Ensure each question has a concise 1-line explanation for the correct answer.
+    Generate a quiz with {num_questions} multiple-choice questions about the topic: "{topic}".
+    Difficulty Level: {difficulty}.
     """
     
     prompt = ChatPromptTemplate.from_template(
@@ -50,7 +64,7 @@ def get_quiz_chain(vector_store, llm_model: str = "gpt-oss:120b-cloud"):
     )
     
     chain = (
-        {"context": retriever | format_docs, "topic": RunnablePassthrough(), "num_questions": RunnablePassthrough(), "difficulty": RunnablePassthrough()} 
+        {"context": RunnableLambda(lambda d: get_context(d["topic"])), "topic": RunnablePassthrough(), "num_questions": RunnablePassthrough(), "difficulty": RunnablePassthrough()} 
         # Note: RunnablePassthrough passes the input dict, so we need to itemgetter or just pass the whole dict to prompt
         | prompt
         | llm
@@ -65,8 +79,7 @@ def get_quiz_chain(vector_store, llm_model: str = "gpt-oss:120b-cloud"):
         # 1. Retrieve docs manually or via chain
         # Let's rebuild the chain to be cleaner
         
-        docs = retriever.invoke(input_data["topic"])
-        formatted_context = format_docs(docs)
+        formatted_context = get_context(input_data["topic"])
         
         final_prompt = prompt.invoke({
             "context": formatted_context,
@@ -1,16 +1,27 @@
-from langchain_ollama import ChatOllama
+import asyncio
+import os
+import time
+from typing import AsyncIterator, Dict, List
+
+from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 
+from src.models import CHAT_MODEL, chat_model
+from src.prompts import SHARED_PREFIX
+
+# Answers generated at once per batch request
+BATCH_CONCURRENCY = int(os.getenv("QUERY_BATCH_CONCURRENCY", "4"))
+
 def format_docs(docs):
     return "\n\n".join(doc.page_content for doc in docs)
 
-def get_intent_chain(llm_model: str = "gpt-oss:120b-cloud"):
+def get_intent_chain(llm_model: str = CHAT_MODEL):
     """
     Classifies the user input into GREETING, GENERAL, or TEXTBOOK.
     """
-    llm = ChatOllama(model=llm_model, temperature=0)
+    llm = chat_model(llm_model, temperature=0)
     
     template = """Classify the following user input into exactly one of these categories:
     1. GREETING (e.g., "hi", "hello", "good morning")
@@ -25,12 +36,12 @@ def get_intent_chain(llm_model: str = "gpt-oss:120b-cloud"):
     prompt = ChatPromptTemplate.from_template(template)
     return prompt | llm | StrOutputParser()
 
-def get_general_chain(llm_model: str = "gpt-oss:120b-cloud"):
+def get_general_chain(llm_model: str = CHAT_MODEL):
     """
     Chain for general conversation and greetings.
     """
-    llm = ChatOllama(model=llm_model)
-    template = """You are a helpful AI assistant named TutorLLM.
+    llm = chat_model(llm_model)
+    template = SHARED_PREFIX + """For this message, simply be a helpful conversational assistant.
     
     User Input: {question}
     
@@ -38,17 +49,17 @@ def get_general_chain(llm_model: str = "gpt-oss:120b-cloud"):
     prompt = ChatPromptTemplate.from_template(template)
     return prompt | llm | StrOutputParser()
 
-def get_rag_chain(vector_store, llm_model: str = "gpt-oss:120b-cloud"):
+def get_retriever(vector_store, k: int = 5):
+    return vector_store.as_retriever(search_kwargs={"k": k})
+
+def get_answer_chain(llm_model: str = CHAT_MODEL):
     """
-    Creates and returns the RAG chain for textbook questions.
+    Answers a question from already retrieved context.
+    Input: {"context": str, "question": str}
     """
-    retriever = vector_store.as_retriever(search_kwargs={"k": 5})
-    
-    llm = ChatOllama(model=llm_model)
+    llm = chat_model(llm_model)
 
-    template = """You are an intelligent tutor assistant designed to help students prepare for exams.
-    
-    Guidelines for your answer:
+    template = SHARED_PREFIX + """Guidelines for your answer:
     1.  **Context First**: Use the provided context to answer the question.
     2.  **Fallback**: If the provided context is empty or does not contain the answer, you MUST state "I couldn't find specific information about this in your uploaded documents." and then provide a helpful answer based on your general knowledge.
     3.  **Structure**: Use bullet points or paragraphs.
@@ -62,17 +73,33 @@ def get_rag_chain(vector_store, llm_model: str = "gpt-oss:120b-cloud"):
     Answer:
     """
     prompt = ChatPromptTemplate.from_template(template)
+    return prompt | llm | StrOutputParser()
+
+def get_rag_chain(vector_store, llm_model: str = CHAT_MODEL):
+    """
+    Creates and returns the RAG chain for textbook questions.
+    """
+    retriever = get_retriever(vector_store)
 
     rag_chain = (
         {"context": retriever | format_docs, "question": RunnablePassthrough()}
-        | prompt
-        | llm
-        | StrOutputParser()
+        | get_answer_chain(llm_model)
     )
 
     return rag_chain
 
-def get_smart_response_chain(vector_store, llm_model: str = "gpt-oss:120b-cloud"):
+def describe_sources(docs):
+    """Source file and page of each retrieved chunk, for showing citations."""
+    sources = []
+    for doc in docs:
+        source = {"source": os.path.basename(doc.metadata.get("source", ""))}
+        if "page" in doc.metadata:
+            source["page"] = doc.metadata["page"]
+        if source not in sources:
+            sources.append(source)
+    return sources
+
+def get_smart_response_chain(vector_store, llm_model: str = CHAT_MODEL):
     """
     Orchestrates intent classification and routing.
     Note: Since we need to stream the final response, this function returns a generator.
@@ -86,5 +113,94 @@ def get_smart_response_chain(vector_store, llm_model: str = "gpt-oss:120b-cloud"
     return {
         "classifier": get_intent_chain(llm_model),
         "general": get_general_chain(llm_model),
-        "rag": get_rag_chain(vector_store, llm_model)
+        "rag": get_rag_chain(vector_store, llm_model),
+        # Retrieval and answering separately, so the server can report sources before streaming
+        "retriever": get_retriever(vector_store),
+        "answer": get_answer_chain(llm_model)
     }
+
+
+def retrieve_batch(vector_store, vectors: List[List[float]], k: int = 5) -> List[List[Document]]:
+    """Top-k chunks for several query embeddings, in one index call where the backend allows it."""
+    if hasattr(vector_store, "similarity_search_by_vectors"):
+        return vector_store.similarity_search_by_vectors(vectors, k=k)
+    collection = getattr(vector_store, "_collection", None)
+    if collection is not None:
+        # Chroma answers all query embeddings in a single query
+        result = collection.query(query_embeddings=vectors, n_results=k, include=["documents", "metadatas"])
+        return [
+            [Document(page_content=text, metadata=meta or {}, id=id_) for id_, text, meta in zip(ids, texts, metas)]
+            for ids, texts, metas in zip(result["ids"], result["documents"], result["metadatas"])
+        ]
+    return [vector_store.similarity_search_by_vector(vector, k=k) for vector in vectors]
+
+async def answer_batch(vector_store, questions: List[str], llm_model: str = CHAT_MODEL, k: int = 5,
+                       concurrency: int = BATCH_CONCURRENCY, classify: bool = True) -> AsyncIterator[Dict]:
+    """
+    Answers many questions at once and yields one result per question as soon
+    as its answer is ready (completion order, not input order; each result
+    carries its `index`).
+
+    Questions are classified concurrently, the TEXTBOOK ones are embedded in a
+    single batched call and retrieved together, then at most `concurrency`
+    answers are generated at a time. With classify=False every question is
+    treated as TEXTBOOK (what evaluation runs want).
+    """
+    started = time.perf_counter()
+    concurrency = max(1, concurrency)
+    chains = get_smart_response_chain(vector_store, llm_model)
+
+    # 1. Intents
+    if classify:
+        raw = await chains["classifier"].abatch(
+            [{"question": q} for q in questions], config={"max_concurrency": concurrency}, return_exceptions=True
+        )
+        intents = ["TEXTBOOK" if isinstance(i, Exception) else i.strip() for i in raw]
+    else:
+        intents = ["TEXTBOOK"] * len(questions)
+    is_general = ["GREETING" in i or "GENERAL" in i for i in intents]
+    classify_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    # 2. One embedding call and one retrieval pass for all textbook questions
+    retrieve_started = time.perf_counter()
+    textbook = [i for i, general in enumerate(is_general) if not general]
+    docs_by_index = {}
+    if textbook:
+        vectors = await vector_store.embeddings.aembed_documents([questions[i] for i in textbook])
+        found = await asyncio.get_running_loop().run_in_executor(None, retrieve_batch, vector_store, vectors, k)
+        docs_by_index = dict(zip(textbook, found))
+    retrieve_ms = round((time.perf_counter() - retrieve_started) * 1000, 1)
+
+    # 3. Generation, bounded
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def answer(index: int) -> Dict:
+        result = {"index": index, "question": questions[index], "intent": intents[index], "sources": []}
+        async with semaphore:
+            generation_started = time.perf_counter()
+            try:
+                if is_general[index]:
+                    result["answer"] = await chains["general"].ainvoke({"question": questions[index]})
+                else:
+                    docs = docs_by_index[index]
+                    result["sources"] = describe_sources(docs)
+                    result["answer"] = await chains["answer"].ainvoke({"context": format_docs(docs), "question": questions[index]})
+                result["error"] = None
+            except Exception as e:
+                result["answer"], result["error"] = None, str(e)
+            result["timings"] = {
+                "classify_ms": classify_ms,
+                "retrieve_ms": retrieve_ms,
+                "generation_ms": round((time.perf_counter() - generation_started) * 1000, 1),
+                "total_ms": round((time.perf_counter() - started) * 1000, 1),
+            }
+        return result
+
+    tasks = [asyncio.ensure_future(answer(i)) for i in range(len(questions))]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Stopped early (e.g. the client disconnected): don't keep generating
+        for task in tasks:
+            task.cancel()
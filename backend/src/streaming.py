@@ -0,0 +1,178 @@
+"""
+Helpers for streaming LLM answers to the client.
+
+- `cancel_on_disconnect` stops pulling from the model as soon as the client
+  goes away and closes the upstream stream, which closes the HTTP request to
+  Ollama so the model stops generating.
+- `coalesce` batches token chunks into frames bounded by size and time, so
+  the response isn't one write per token.
+- `generation_metrics` counts completed and cancelled generations and an
+  estimate of the model time saved by cancelling (per worker process).
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import AsyncIterator, Dict
+
+# A frame is flushed once it holds this many characters or its first token is this old
+STREAM_FLUSH_CHARS = int(os.getenv("STREAM_FLUSH_CHARS", "256"))
+STREAM_FLUSH_MS = float(os.getenv("STREAM_FLUSH_MS", "50"))
+DISCONNECT_POLL_S = float(os.getenv("DISCONNECT_POLL_S", "0.25"))
+
+
+async def _close_stream(stream: AsyncIterator, pending):
+    if pending is not None:
+        pending.cancel()
+        await asyncio.gather(pending, return_exceptions=True)
+    aclose = getattr(stream, "aclose", None)
+    if aclose is not None:
+        try:
+            await aclose()
+        except Exception:
+            pass
+
+
+def _close_detached(stream: AsyncIterator, pending):
+    """
+    Cancels an in-flight read and closes the stream from a separate task:
+    the caller may be inside a cancelled scope where any further await would
+    be cancelled too, leaving the model request open.
+    """
+    if pending is not None and pending.done():
+        pending = None
+    try:
+        asyncio.ensure_future(_close_stream(stream, pending))
+    except RuntimeError:
+        # No running loop (generator finalized at shutdown): nothing left to cancel
+        pass
+
+
+class GenerationMetrics:
+    """
+    Counters for streamed generations. Seconds saved by a cancellation are
+    estimated as the average duration of completed generations minus the
+    time the cancelled one had already run.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.cancelled = 0
+        self.errors = 0
+        self.completed_seconds = 0.0
+        self.cancelled_seconds = 0.0
+        self.seconds_saved = 0.0
+        self.chars_streamed = 0
+
+    def average_duration(self) -> float:
+        return self.completed_seconds / self.completed if self.completed else 0.0
+
+    def record_completed(self, seconds: float, chars: int):
+        with self._lock:
+            self.completed += 1
+            self.completed_seconds += seconds
+            self.chars_streamed += chars
+
+    def record_cancelled(self, seconds: float, chars: int):
+        with self._lock:
+            self.cancelled += 1
+            self.cancelled_seconds += seconds
+            self.chars_streamed += chars
+            self.seconds_saved += max(0.0, self.average_duration() - seconds)
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "completed": self.completed,
+                "cancelled": self.cancelled,
+                "errors": self.errors,
+                "avg_generation_s": round(self.average_duration(), 3),
+                "cancelled_generation_s": round(self.cancelled_seconds, 3),
+                "estimated_seconds_saved": round(self.seconds_saved, 3),
+                "chars_streamed": self.chars_streamed,
+            }
+
+
+generation_metrics = GenerationMetrics()
+
+
+async def cancel_on_disconnect(stream: AsyncIterator, request, state: Dict) -> AsyncIterator:
+    """
+    Yields from `stream` until it ends or the client disconnects. On disconnect
+    (or if the response task itself is cancelled) the upstream stream is
+    closed right away and `state["cancelled"]` is set.
+    """
+    state.setdefault("cancelled", False)
+    pending = None
+    try:
+        while True:
+            pending = asyncio.ensure_future(stream.__anext__())
+            # Poll for a disconnect while waiting: a slow model may not produce a token for a while
+            while not pending.done():
+                await asyncio.wait({pending}, timeout=DISCONNECT_POLL_S)
+                if not pending.done() and await request.is_disconnected():
+                    state["cancelled"] = True
+                    return
+            try:
+                chunk = pending.result()
+            except StopAsyncIteration:
+                return
+            pending = None
+            yield chunk
+            if await request.is_disconnected():
+                state["cancelled"] = True
+                return
+    except (asyncio.CancelledError, GeneratorExit):
+        state["cancelled"] = True
+        raise
+    finally:
+        _close_detached(stream, pending)
+
+
+async def coalesce(stream: AsyncIterator, max_chars: int = STREAM_FLUSH_CHARS, max_delay_ms: float = STREAM_FLUSH_MS) -> AsyncIterator[str]:
+    """Joins small text chunks into frames of up to max_chars or max_delay_ms."""
+    buffer = []
+    size = 0
+    deadline = None
+    pending = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(stream.__anext__())
+            timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                # Frame is old enough: send it even though the next token hasn't arrived
+                yield "".join(buffer)
+                buffer, size, deadline = [], 0, None
+                continue
+            try:
+                chunk = str(pending.result())
+            except StopAsyncIteration:
+                pending = None
+                break
+            pending = None
+            if not chunk:
+                continue
+            buffer.append(chunk)
+            size += len(chunk)
+            if deadline is None:
+                deadline = time.perf_counter() + max_delay_ms / 1000
+            if size >= max_chars:
+                yield "".join(buffer)
+                buffer, size, deadline = [], 0, None
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        _close_detached(stream, pending)
+
+
+def sse_event(event: str, data) -> str:
+    """Formats one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,261 @@
+"""
+Ingest-time document summaries, topic outline and pre-generated decks.
+
+After a document is ingested it is grouped into sections of consecutive
+chunks; each section is summarized by the LLM, then the section summaries are
+condensed into a document summary and a topic outline. Everything is stored in
+SQLite next to the user data, so topic lists are answered without an LLM call
+and flashcard/quiz generation can use a few compact section summaries as
+context instead of raw chunks. Optionally, flashcard and quiz decks for the
+top topics of each new document are generated ahead of time.
+"""
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+from pydantic import BaseModel, Field
+
+from src.database import get_connection
+from src.ingestion import token_length
+from src.models import CHAT_MODEL, chat_model
+
+SUMMARIZE_ON_INGEST = os.getenv("SUMMARIZE_ON_INGEST", "1") == "1"
+PREWARM_DECKS = os.getenv("PREWARM_DECKS", "0") == "1"
+PREWARM_TOP_TOPICS = int(os.getenv("PREWARM_TOP_TOPICS", "3"))
+# Approximate size of the chunk groups that get one summary each
+SECTION_TOKENS = int(os.getenv("SUMMARY_SECTION_TOKENS", "2500"))
+# Upper bound on LLM section summaries per document; longer documents are sampled evenly
+MAX_SECTIONS = int(os.getenv("SUMMARY_MAX_SECTIONS", "40"))
+
+# One worker: summaries are background work and shouldn't compete with live requests for the LLM
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summaries")
+
+STOPWORDS = {"the", "and", "for", "with", "about", "from", "into", "that", "this", "what", "how", "are", "its", "of", "in", "on", "to", "a", "an"}
+
+
+class SectionSummary(BaseModel):
+    title: str = Field(description="A short title for the section (max 8 words)")
+    summary: str = Field(description="A dense summary of the section in 3-6 sentences, keeping key terms, facts and definitions")
+    topics: List[str] = Field(description="2-5 short topic names covered by the section")
+
+
+class OutlineTopic(BaseModel):
+    topic: str = Field(description="A short topic name")
+    sections: List[int] = Field(description="Indexes of the sections that cover this topic")
+
+
+class DocumentOutline(BaseModel):
+    summary: str = Field(description="A summary of the whole document in one paragraph")
+    topics: List[OutlineTopic] = Field(description="The main topics of the document, most important first")
+
+
+def _keywords(text: str) -> set:
+    return {w for w in re.findall(r"[a-z0-9]+", text.lower()) if len(w) > 2 and w not in STOPWORDS}
+
+
+def group_sections(splits: List[Document], max_tokens: int = SECTION_TOKENS,
+                   max_sections: int = MAX_SECTIONS) -> List[List[Document]]:
+    """
+    Groups consecutive chunks into sections of roughly max_tokens each, keeping
+    at most max_sections of them spread evenly over the document. Tabular row
+    windows are left out: the schema and column-summary documents already
+    describe the table, and summarizing every window would cost one LLM call each.
+    """
+    sections, current, size = [], [], 0
+    for split in splits:
+        if split.metadata.get("table_kind") == "rows":
+            continue
+        tokens = token_length(split.page_content)
+        if current and size + tokens > max_tokens:
+            sections.append(current)
+            current, size = [], 0
+        current.append(split)
+        size += tokens
+    if current:
+        sections.append(current)
+    if len(sections) > max_sections:
+        step = len(sections) / max_sections
+        sections = [sections[int(i * step)] for i in range(max_sections)]
+    return sections
+
+
+def summarize_document(filename: str, splits: List[Document], llm_model: str = CHAT_MODEL) -> Dict:
+    """Summarizes a document section by section, builds its topic outline and stores both."""
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import JsonOutputParser
+
+    llm = chat_model(llm_model, temperature=0)
+
+    section_parser = JsonOutputParser(pydantic_object=SectionSummary)
+    section_prompt = ChatPromptTemplate.from_template(
+        """You are summarizing study material so a tutor can later write flashcards and quizzes from the summary alone.
+    {format_instructions}
+
+    Section text:
+    {text}
+    """,
+        partial_variables={"format_instructions": section_parser.get_format_instructions()}
+    )
+    outline_parser = JsonOutputParser(pydantic_object=DocumentOutline)
+    outline_prompt = ChatPromptTemplate.from_template(
+        """You are building a topic outline of a document from its numbered section summaries.
+    {format_instructions}
+
+    Section summaries:
+    {sections}
+    """,
+        partial_variables={"format_instructions": outline_parser.get_format_instructions()}
+    )
+
+    grouped = group_sections(splits)
+    if not grouped:
+        return {"filename": filename, "sections": [], "outline": {}}
+    sections = []
+    for index, section in enumerate(grouped):
+        text = "\n\n".join(doc.page_content for doc in section)
+        result = (section_prompt | llm | section_parser).invoke({"text": text})
+        sections.append({
+            "index": index,
+            "title": result.get("title", f"Section {index + 1}"),
+            "summary": result.get("summary", ""),
+            "topics": result.get("topics", []),
+        })
+
+    numbered = "\n".join(f"[{s['index']}] {s['title']}: {s['summary']}" for s in sections)
+    outline = (outline_prompt | llm | outline_parser).invoke({"sections": numbered})
+
+    conn = get_connection()
+    with conn:
+        conn.execute("DELETE FROM document_summaries WHERE filename = ?", (filename,))
+        conn.executemany(
+            "INSERT INTO document_summaries (filename, kind, section_index, title, summary, topics) VALUES (?, 'section', ?, ?, ?, ?)",
+            [(filename, s["index"], s["title"], s["summary"], json.dumps(s["topics"])) for s in sections]
+        )
+        conn.execute(
+            "INSERT INTO document_summaries (filename, kind, title, summary, topics) VALUES (?, 'document', ?, ?, ?)",
+            (filename, filename, outline.get("summary", ""), json.dumps(outline.get("topics", [])))
+        )
+    print(f"Stored {len(sections)} section summaries and {len(outline.get('topics', []))} topics for {filename}")
+    return {"filename": filename, "sections": sections, "outline": outline}
+
+
+def _summarize_and_prewarm(filename: str, splits: List[Document], vector_store, prewarm: bool):
+    try:
+        result = summarize_document(filename, splits)
+        if prewarm:
+            topics = [t["topic"] for t in result["outline"].get("topics", [])[:PREWARM_TOP_TOPICS]]
+            prewarm_decks(filename, topics, vector_store)
+    except Exception as e:
+        print(f"Error summarizing {filename}: {e}")
+
+
+def schedule_summaries(filename: str, splits: List[Document], vector_store=None, prewarm: bool = PREWARM_DECKS) -> Future:
+    """Queues summarization (and optional deck pre-warming) for a freshly ingested document."""
+    return _executor.submit(_summarize_and_prewarm, filename, splits, vector_store, prewarm)
+
+
+def get_topics(filename: str = None) -> List[Dict]:
+    """Document summaries and topic outlines, straight from the database."""
+    query = "SELECT filename, summary, topics, created_at FROM document_summaries WHERE kind = 'document'"
+    params = ()
+    if filename:
+        query += " AND filename = ?"
+        params = (filename,)
+    rows = get_connection().execute(query + " ORDER BY created_at DESC", params).fetchall()
+    return [
+        {"filename": r["filename"], "summary": r["summary"], "topics": json.loads(r["topics"]), "created_at": r["created_at"]}
+        for r in rows
+    ]
+
+
+def get_summary_context(topic: str, max_sections: int = 4) -> Optional[str]:
+    """
+    Section summaries relevant to a topic, formatted as LLM context, or None if
+    no stored section covers the topic well enough (callers then fall back to retrieval).
+    """
+    wanted = _keywords(topic)
+    if not wanted:
+        return None
+    rows = get_connection().execute(
+        "SELECT filename, title, summary, topics FROM document_summaries WHERE kind = 'section'"
+    ).fetchall()
+
+    scored = []
+    for row in rows:
+        labels = _keywords(row["title"] or "") | _keywords(" ".join(json.loads(row["topics"])))
+        body = _keywords(row["summary"])
+        # Require at least half the topic's words in the section's title/topics
+        label_hits = len(wanted & labels)
+        if label_hits * 2 < len(wanted):
+            continue
+        scored.append((label_hits * 2 + len(wanted & body), row))
+
+    if not scored:
+        return None
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return "\n\n".join(
+        f"{row['title']} ({row['filename']}):\n{row['summary']}" for _, row in scored[:max_sections]
+    )
+
+
+def delete_summaries(filename: str):
+    conn = get_connection()
+    with conn:
+        conn.execute("DELETE FROM document_summaries WHERE filename = ?", (filename,))
+        conn.execute("DELETE FROM decks WHERE filename = ? AND consumed = 0", (filename,))
+
+
+def _normalize_topic(topic: str) -> str:
+    return " ".join(topic.lower().split())
+
+
+def save_deck(kind: str, topic: str, params: Dict, content, source: str, filename: str = None, consumed: bool = True,
+              owner: str = None) -> int:
+    """Stores a generated flashcard or quiz deck; `owner` is the user it was served to."""
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute(
+            "INSERT INTO decks (kind, topic, params, content, source, consumed, filename, owner) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (kind, _normalize_topic(topic), json.dumps(params, sort_keys=True), json.dumps(content), source, int(consumed), filename, owner)
+        )
+    return cursor.lastrowid
+
+
+def take_deck(kind: str, topic: str, params: Dict, owner: str = None):
+    """
+    Returns an unused pre-warmed deck for this topic and parameters, marking it
+    used by `owner`, or None. Each pre-warmed deck is served once so repeat requests still
+    get fresh questions.
+    """
+    conn = get_connection()
+    with conn:
+        row = conn.execute(
+            "SELECT id, content FROM decks WHERE kind = ? AND topic = ? AND params = ? AND consumed = 0 ORDER BY id LIMIT 1",
+            (kind, _normalize_topic(topic), json.dumps(params, sort_keys=True))
+        ).fetchone()
+        if row is None:
+            return None
+        updated = conn.execute("UPDATE decks SET consumed = 1, owner = ? WHERE id = ? AND consumed = 0", (owner, row["id"])).rowcount
+    # Another worker may have taken it between the select and the update
+    return json.loads(row["content"]) if updated else None
+
+
+def prewarm_decks(filename: str, topics: List[str], vector_store=None):
+    """Generates and stores one flashcard deck and one default quiz per topic."""
+    from src.flashcards import get_flashcard_chain
+    from src.quiz import get_quiz_chain, DEFAULT_QUIZ_PARAMS
+
+    flashcard_chain = get_flashcard_chain(vector_store)
+    quiz_func = get_quiz_chain(vector_store)
+    for topic in topics:
+        try:
+            cards = flashcard_chain.invoke(topic)
+            save_deck("flashcards", topic, {}, cards.get("flashcards", cards), "prewarm", filename, consumed=False)
+            quiz = quiz_func(dict(DEFAULT_QUIZ_PARAMS, topic=topic))
+            save_deck("quiz", topic, DEFAULT_QUIZ_PARAMS, quiz, "prewarm", filename, consumed=False)
+            print(f"Pre-warmed flashcards and quiz for '{topic}'")
+        except Exception as e:
+            print(f"Error pre-warming decks for '{topic}': {e}")
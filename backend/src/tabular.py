@@ -0,0 +1,334 @@
+"""
+Columnar ingestion for CSV and Excel files.
+
+CSVLoader makes one document per row, so a large sheet becomes as many
+embeddings as it has rows. Here a table is read in row groups (pandas chunks
+for CSV, openpyxl read-only rows for Excel) and turned into three kinds of
+documents per sheet:
+
+- "schema": columns, inferred types, row count and a few sample rows
+- "columns": per-column statistics (nulls, numeric range/mean, top values)
+- "rows": windows of consecutive rows, sized to fit one tabular chunk
+
+The raw rows are also written to a per-file SQLite database under
+data/tables/, so exact questions ("the row where id = 1042") are answered
+with `lookup_rows` instead of by similarity search.
+"""
+import os
+import re
+import sqlite3
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.document_loaders import BaseLoader
+from langchain_core.documents import Document
+
+from src.database import DATA_DIR
+
+TABLES_DIR = os.path.join(DATA_DIR, "tables")
+# Rows read per pandas/openpyxl chunk
+TABULAR_READ_ROWS = int(os.getenv("TABULAR_READ_ROWS", "10000"))
+# Upper bound on rows per "rows" document (the token budget usually ends a window first)
+TABULAR_WINDOW_ROWS = int(os.getenv("TABULAR_WINDOW_ROWS", "100"))
+SAMPLE_ROWS = 3
+TOP_VALUES = 5
+# Distinct values tracked per column for the top-values summary
+MAX_TRACKED_VALUES = 2000
+
+
+class _ColumnStats:
+    """Running statistics for one column, updated chunk by chunk."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.nulls = 0
+        self.numeric = 0
+        self.minimum = None
+        self.maximum = None
+        self.total = 0.0
+        self.values = Counter()
+
+    def update(self, series):
+        import pandas as pd
+
+        self.count += len(series)
+        self.nulls += int(series.isna().sum())
+        present = series.dropna()
+        numbers = pd.to_numeric(present, errors="coerce").dropna()
+        if len(numbers):
+            self.numeric += len(numbers)
+            self.total += float(numbers.sum())
+            low, high = float(numbers.min()), float(numbers.max())
+            self.minimum = low if self.minimum is None else min(self.minimum, low)
+            self.maximum = high if self.maximum is None else max(self.maximum, high)
+        for value, n in present.astype(str).value_counts().items():
+            if value in self.values or len(self.values) < MAX_TRACKED_VALUES:
+                self.values[value] += int(n)
+
+    @property
+    def kind(self) -> str:
+        present = self.count - self.nulls
+        if present and self.numeric >= present * 0.95:
+            return "numeric"
+        return "text"
+
+    def describe(self) -> str:
+        parts = [f"{self.name} ({self.kind})", f"{self.nulls} empty of {self.count}"]
+        if self.kind == "numeric" and self.numeric:
+            parts.append(f"min {self.minimum:g}, max {self.maximum:g}, mean {self.total / self.numeric:g}")
+        distinct = len(self.values)
+        if self.kind == "text" or distinct <= TOP_VALUES * 2:
+            top = ", ".join(f"{value} ({n})" for value, n in self.values.most_common(TOP_VALUES))
+            suffix = "+" if distinct >= MAX_TRACKED_VALUES else ""
+            parts.append(f"{distinct}{suffix} distinct; most common: {top}")
+        return "; ".join(parts)
+
+
+SHEETS_TABLE = "_sheets"
+
+
+def _table_name(sheet: str) -> str:
+    return re.sub(r"\W+", "_", sheet).strip("_") or "sheet"
+
+
+def _unique_table(sheet: str, taken: set) -> str:
+    """Table name for a sheet, unique without case among `taken` (which it is added to)."""
+    base = _table_name(sheet)
+    name, suffix = base, 1
+    while name.lower() in taken:
+        suffix += 1
+        name = f"{base}_{suffix}"
+    taken.add(name.lower())
+    return name
+
+
+def _unique_columns(names) -> List[str]:
+    """
+    Column names that are unique as SQLite identifiers: compared without case
+    ("Name" and "name" collide) and never "_row", which holds the row number.
+    """
+    columns, taken = [], {"_row"}
+    for name in (str(n) for n in names):
+        candidate, suffix = name, 1
+        while candidate.lower() in taken:
+            suffix += 1
+            candidate = f"{name}_{suffix}"
+        taken.add(candidate.lower())
+        columns.append(candidate)
+    return columns
+
+
+def table_db_path(filename: str) -> str:
+    return os.path.join(TABLES_DIR, f"{filename}.sqlite")
+
+
+def iter_row_groups(file_path: str, chunk_rows: int = TABULAR_READ_ROWS) -> Iterator[Tuple[str, "object"]]:
+    """Yields (sheet name, DataFrame) row groups without loading the whole file."""
+    import pandas as pd
+
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == ".csv":
+        for chunk in pd.read_csv(file_path, chunksize=chunk_rows):
+            yield "data", chunk
+    elif ext == ".xlsx":
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            for sheet in workbook.worksheets:
+                rows = sheet.iter_rows(values_only=True)
+                header = next(rows, None)
+                if header is None:
+                    continue
+                columns = [str(c) if c is not None else f"column_{i + 1}" for i, c in enumerate(header)]
+                batch = []
+                width = len(columns)
+                for row in rows:
+                    batch.append(tuple(row[:width]) + (None,) * (width - len(row)))
+                    if len(batch) >= chunk_rows:
+                        yield sheet.title, pd.DataFrame(batch, columns=columns)
+                        batch = []
+                if batch:
+                    yield sheet.title, pd.DataFrame(batch, columns=columns)
+        finally:
+            workbook.close()
+    else:
+        # Legacy .xls has no streaming reader; read each sheet at once
+        for sheet, frame in pd.read_excel(file_path, sheet_name=None).items():
+            for start in range(0, len(frame), chunk_rows):
+                yield sheet, frame.iloc[start:start + chunk_rows]
+
+
+def _format_value(value) -> str:
+    text = "" if value is None or value != value else str(value)
+    return text.replace("\n", " ").replace("|", "/")
+
+
+def load_table(file_path: str, window_tokens: Optional[int] = None) -> List[Document]:
+    """
+    Reads a CSV/Excel file into schema, column-summary and row-window
+    documents, and stores the raw rows in data/tables/<filename>.sqlite.
+    """
+    from src.ingestion import _chunking_config, token_length
+
+    window_tokens = window_tokens or _chunking_config("tabular")[0]
+    filename = os.path.basename(file_path)
+    os.makedirs(TABLES_DIR, exist_ok=True)
+    db_path = table_db_path(filename)
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+
+    docs: List[Document] = []
+    sheets: Dict[str, Dict] = {}
+    # "Sheet 1" and "Sheet-1" clean up to the same identifier; each sheet gets its own table
+    tables = {SHEETS_TABLE}
+
+    def flush_window(sheet: str, info: Dict):
+        if info["window"]:
+            header = " | ".join(info["columns"])
+            text = f"{filename} / {sheet}, rows {info['window_start']}-{info['window_start'] + len(info['window']) - 1}\n{header}\n" + "\n".join(info["window"])
+            docs.append(Document(page_content=text, metadata={
+                "source": file_path, "sheet": sheet, "table_kind": "rows",
+                "row_start": info["window_start"], "row_end": info["window_start"] + len(info["window"]) - 1,
+            }))
+        info["window"], info["window_tokens"] = [], 0
+
+    try:
+        for sheet, frame in iter_row_groups(file_path):
+            info = sheets.get(sheet)
+            if info is None:
+                columns = _unique_columns(frame.columns)
+                info = sheets[sheet] = {
+                    "table": _unique_table(sheet, tables),
+                    "columns": columns, "rows": 0, "stats": [_ColumnStats(c) for c in columns],
+                    "samples": [], "window": [], "window_tokens": 0, "window_start": 1,
+                    # Header line plus the "file / sheet, rows a-b" title
+                    "header_tokens": token_length(" | ".join(columns)) + 16,
+                }
+            # Raw rows for exact lookups; _row is the 1-based data row number
+            frame = frame.copy()
+            frame.columns = info["columns"]
+            frame.insert(0, "_row", range(info["rows"] + 1, info["rows"] + len(frame) + 1))
+            frame.to_sql(info["table"], conn, if_exists="append", index=False)
+
+            for stats in info["stats"]:
+                stats.update(frame[stats.name])
+
+            for values in frame.itertuples(index=False):
+                row_number, cells = values[0], values[1:]
+                line = " | ".join(_format_value(v) for v in cells)
+                if len(info["samples"]) < SAMPLE_ROWS:
+                    info["samples"].append(line)
+                tokens = token_length(line)
+                if info["window"] and (info["window_tokens"] + tokens + info["header_tokens"] > window_tokens
+                                       or len(info["window"]) >= TABULAR_WINDOW_ROWS):
+                    flush_window(sheet, info)
+                if not info["window"]:
+                    info["window_start"] = row_number
+                info["window"].append(line)
+                info["window_tokens"] += tokens
+            info["rows"] += len(frame)
+        conn.execute(f'CREATE TABLE "{SHEETS_TABLE}" (name TEXT PRIMARY KEY, sheet TEXT NOT NULL)')
+        conn.executemany(f'INSERT INTO "{SHEETS_TABLE}" (name, sheet) VALUES (?, ?)',
+                         [(info["table"], sheet) for sheet, info in sheets.items()])
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+
+    for sheet, info in sheets.items():
+        flush_window(sheet, info)
+        schema = "\n".join(f"- {s.name}: {s.kind}" for s in info["stats"])
+        samples = "\n".join(info["samples"])
+        docs.append(Document(
+            page_content=(f"Table {filename} / {sheet}: {info['rows']} rows, {len(info['columns'])} columns.\n"
+                          f"Columns:\n{schema}\nSample rows:\n{' | '.join(info['columns'])}\n{samples}"),
+            metadata={"source": file_path, "sheet": sheet, "table_kind": "schema", "rows": info["rows"]},
+        ))
+        docs.append(Document(
+            page_content=f"Column summary of {filename} / {sheet}:\n" + "\n".join(f"- {s.describe()}" for s in info["stats"]),
+            metadata={"source": file_path, "sheet": sheet, "table_kind": "columns"},
+        ))
+    return docs
+
+
+class TableLoader(BaseLoader):
+    """LangChain loader interface over `load_table`."""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+
+    def lazy_load(self) -> Iterator[Document]:
+        yield from load_table(self.file_path)
+
+
+def _connect(filename: str) -> sqlite3.Connection:
+    path = table_db_path(os.path.basename(filename))
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No table stored for {filename}")
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def describe_table(filename: str) -> List[Dict]:
+    """Sheets of a stored table (table name and original sheet title) with their columns and row counts."""
+    conn = _connect(filename)
+    try:
+        titles = {}
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SHEETS_TABLE,)).fetchone():
+            titles = {row["name"]: row["sheet"] for row in conn.execute(f'SELECT name, sheet FROM "{SHEETS_TABLE}"')}
+        sheets = []
+        for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name != ? ORDER BY name", (SHEETS_TABLE,)):
+            columns = [row["name"] for row in conn.execute(f'PRAGMA table_info("{name}")') if row["name"] != "_row"]
+            rows = conn.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0]
+            sheets.append({"sheet": name, "title": titles.get(name, name), "columns": columns, "rows": rows})
+        return sheets
+    finally:
+        conn.close()
+
+
+def lookup_rows(filename: str, sheet: Optional[str] = None, column: Optional[str] = None, value: Optional[str] = None,
+                limit: int = 50, offset: int = 0) -> Dict:
+    """
+    Exact row lookup in a stored table: rows whose `column` equals `value`
+    (compared as text), or a page of all rows if no column is given.
+    """
+    described = describe_table(filename)
+    sheets = {s["sheet"]: s for s in described}
+    if not sheet:
+        name = next(iter(sheets), None)
+    else:
+        # Original sheet title (as in the documents' metadata), table name, or its cleaned-up form
+        name = next((s["sheet"] for s in described if s["title"] == sheet), sheet if sheet in sheets else _table_name(sheet))
+    if name not in sheets:
+        raise KeyError(f"Unknown sheet: {sheet}")
+    columns = sheets[name]["columns"]
+    if column is not None and column not in columns:
+        raise KeyError(f"Unknown column: {column}")
+
+    query, params = f'SELECT * FROM "{name}"', []
+    if column is not None:
+        # Identifiers can't be bound, so the column is checked against the schema above.
+        # Numbers match numerically ("1042" finds 1042.0), everything else as text.
+        query += f' WHERE ("{column}" = ? OR CAST("{column}" AS TEXT) = ?)'
+        try:
+            params += [float(value), value]
+        except (TypeError, ValueError):
+            params += [value, value]
+    query += " ORDER BY _row LIMIT ? OFFSET ?"
+    conn = _connect(filename)
+    try:
+        rows = [dict(row) for row in conn.execute(query, params + [limit, offset])]
+    finally:
+        conn.close()
+    return {"sheet": name, "columns": columns, "rows": rows}
+
+
+def delete_table(filename: str):
+    path = table_db_path(os.path.basename(filename))
+    if os.path.exists(path):
+        os.remove(path)
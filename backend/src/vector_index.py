@@ -0,0 +1,395 @@
+"""
+In-process vector index backed by memory-mapped NumPy segments.
+
+Drop-in alternative to the Chroma store for per-course corpora of up to a few
+hundred thousand chunks: it implements the LangChain VectorStore interface
+(`add_documents`, `as_retriever`, `similarity_search`, `delete`) so the chains
+don't need to know which backend they got.
+
+On disk a store is a directory of append-only segments. Each `add_texts` call
+writes one segment: `seg_NNNNNN.npy` holds the L2-normalized embeddings and
+`seg_NNNNNN.jsonl` the ids, texts and metadata, in the same row order.
+Segments are opened with `mmap_mode="r"`, so only the pages touched by a
+search are paged in. Deletes and replacements are recorded in
+`tombstones.json` as id -> last dead segment number and, in memory, in a
+boolean alive mask per segment that searches apply directly.
+
+Segments are merged size-tiered: once MERGE_FACTOR segments with live row
+counts of the same order of magnitude exist, they are rewritten as one
+without their dead rows. Each row is rewritten about once per tier rather
+than on every compaction, so the write cost stays proportional to
+N log N instead of growing with the square of the number of adds.
+"""
+import json
+import os
+import threading
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+# Segments of the same size tier merged together, and a hard cap on the segment count
+MERGE_FACTOR = int(os.getenv("VECTOR_INDEX_MERGE_FACTOR", "4"))
+MAX_SEGMENTS = int(os.getenv("VECTOR_INDEX_MAX_SEGMENTS", "16"))
+
+
+class _Segment:
+    """One immutable segment: a memory-mapped matrix plus its row records."""
+
+    def __init__(self, name: str, matrix: np.ndarray, records: List[Dict], tombstones: Optional[Dict[str, int]] = None):
+        self.name = name
+        self.number = int(name.split("_")[1])
+        self.matrix = matrix
+        self.ids = [r["id"] for r in records]
+        self.texts = [r["text"] for r in records]
+        self.metadatas = [r["metadata"] for r in records]
+        self.rows = {id_: row for row, id_ in enumerate(self.ids)}
+        # Replaced (never mutated) when rows die, so a search always sees one consistent mask
+        if tombstones:
+            self.alive = np.fromiter((tombstones.get(id_, 0) < self.number for id_ in self.ids),
+                                     dtype=bool, count=len(self.ids))
+        else:
+            self.alive = np.ones(len(self.ids), dtype=bool)
+        self.live = int(self.alive.sum())
+
+    def kill_rows(self, rows: List[int]):
+        alive = self.alive.copy()
+        alive[rows] = False
+        self.alive, self.live = alive, int(alive.sum())
+
+
+def _matches(metadata: Dict, where: Dict) -> bool:
+    """Chroma-style metadata filter: equality, `$in`, `$ne`, combined with `$and`/`$or`."""
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_matches(metadata, c) for c in condition):
+                return False
+        elif key == "$or":
+            if not any(_matches(metadata, c) for c in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for op, operand in condition.items():
+                if op == "$eq" and value != operand:
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$nin" and value in operand:
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class NumpyVectorStore(VectorStore):
+    """Vector store that keeps embeddings in memory-mapped NumPy segments."""
+
+    def __init__(self, embedding_function: Embeddings, persist_directory: str, dtype: str = "float32",
+                 max_segments: int = MAX_SEGMENTS, merge_factor: int = MERGE_FACTOR):
+        self._embedding_function = embedding_function
+        self.persist_directory = persist_directory
+        self.dtype = np.dtype(dtype)
+        self.max_segments = max_segments
+        self.merge_factor = max(2, merge_factor)
+        self._lock = threading.RLock()
+        os.makedirs(persist_directory, exist_ok=True)
+        self._tombstones = self._load_tombstones()
+        self._segments: Tuple[_Segment, ...] = tuple(self._open_segments())
+        self._next_segment = 1 + max((s.number for s in self._segments), default=0)
+        self._ids = {id_ for s in self._segments for id_ in s.ids}
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding_function
+
+    # Storage
+
+    def _segment_paths(self, name: str) -> Tuple[str, str]:
+        base = os.path.join(self.persist_directory, name)
+        return base + ".npy", base + ".jsonl"
+
+    def _open_segment(self, name: str) -> _Segment:
+        npy_path, jsonl_path = self._segment_paths(name)
+        with open(jsonl_path, "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        return _Segment(name, np.load(npy_path, mmap_mode="r"), records, self._tombstones)
+
+    def _open_segments(self) -> List[_Segment]:
+        names = sorted(
+            f[:-4] for f in os.listdir(self.persist_directory)
+            if f.startswith("seg_") and f.endswith(".npy")
+            # A segment is complete once its records file exists (written last)
+            and os.path.exists(os.path.join(self.persist_directory, f[:-4] + ".jsonl"))
+        )
+        return [self._open_segment(name) for name in names]
+
+    def _write_segment(self, matrix: np.ndarray, records: List[Dict]) -> _Segment:
+        name = f"seg_{self._next_segment:06d}"
+        self._next_segment += 1
+        npy_path, jsonl_path = self._segment_paths(name)
+        np.save(npy_path, matrix.astype(self.dtype, copy=False))
+        # Records are written via a temp file so a crash never leaves a readable half segment
+        with open(jsonl_path + ".tmp", "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        os.replace(jsonl_path + ".tmp", jsonl_path)
+        return self._open_segment(name)
+
+    def _load_tombstones(self) -> Dict[str, int]:
+        path = os.path.join(self.persist_directory, "tombstones.json")
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def _save_tombstones(self):
+        path = os.path.join(self.persist_directory, "tombstones.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(self._tombstones, f)
+        os.replace(path + ".tmp", path)
+
+    def _kill(self, ids: Iterable[str]):
+        """Marks every existing row for these ids as dead."""
+        last = self._next_segment - 1
+        tombstones = dict(self._tombstones)
+        killed = [id_ for id_ in set(ids) if id_ in self._ids]
+        for id_ in killed:
+            tombstones[id_] = last
+        # Swap rather than mutate so concurrent searches see a consistent dict
+        self._tombstones = tombstones
+        self._save_tombstones()
+        for segment in self._segments:
+            rows = [segment.rows[id_] for id_ in killed if id_ in segment.rows]
+            if rows:
+                segment.kill_rows(rows)
+
+    # Writes
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[Dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+
+        vectors = np.asarray(self._embedding_function.embed_documents(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1, norms)
+
+        records = [{"id": i, "text": t, "metadata": m or {}} for i, t, m in zip(ids, texts, metadatas)]
+        with self._lock:
+            # Re-adding an id replaces the earlier row
+            if not self._ids.isdisjoint(ids):
+                self._kill(ids)
+            segment = self._write_segment(vectors, records)
+            self._segments = self._segments + (segment,)
+            self._ids.update(ids)
+            self._merge_tiers()
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if not ids:
+            return False
+        with self._lock:
+            self._kill(ids)
+        return True
+
+    def delete_collection(self):
+        """Removes every segment (used when an index version is garbage collected)."""
+        with self._lock:
+            for segment in self._segments:
+                for path in self._segment_paths(segment.name):
+                    os.remove(path)
+            self._segments = ()
+            self._ids = set()
+            self._tombstones = {}
+            self._save_tombstones()
+
+    def _tier(self, segment: _Segment) -> int:
+        """Order of magnitude of the live row count, in powers of merge_factor."""
+        tier, live = 0, segment.live
+        while live >= self.merge_factor:
+            live //= self.merge_factor
+            tier += 1
+        return tier
+
+    def _merge_tiers(self):
+        """Merges same-tier segments, then the smallest ones while over max_segments."""
+        with self._lock:
+            while True:
+                tiers: Dict[int, List[_Segment]] = {}
+                for segment in self._segments:
+                    tiers.setdefault(self._tier(segment), []).append(segment)
+                full = [group for _, group in sorted(tiers.items()) if len(group) >= self.merge_factor]
+                if full:
+                    self._merge(full[0][:self.merge_factor])
+                elif len(self._segments) > self.max_segments:
+                    self._merge(sorted(self._segments, key=lambda seg: seg.live)[:self.merge_factor])
+                else:
+                    return
+
+    def _merge(self, segments: List[_Segment]):
+        """Rewrites `segments` as one new segment without their dead rows."""
+        with self._lock:
+            matrices, records, dropped = [], [], set()
+            for segment in segments:
+                keep = np.flatnonzero(segment.alive)
+                dropped.update(segment.ids[i] for i in np.flatnonzero(~segment.alive))
+                if not len(keep):
+                    continue
+                matrices.append(np.asarray(segment.matrix[keep]))
+                records.extend(
+                    {"id": segment.ids[i], "text": segment.texts[i], "metadata": segment.metadatas[i]}
+                    for i in keep
+                )
+            merged = (self._write_segment(np.concatenate(matrices), records),) if records else ()
+            names = {segment.name for segment in segments}
+            self._segments = tuple(seg for seg in self._segments if seg.name not in names) + merged
+            # A tombstone is only needed while some segment still holds a dead row for the id
+            check = dropped | {r["id"] for r in records if r["id"] in self._tombstones}
+            gone, settled = set(), set()
+            for id_ in check:
+                holders = [seg for seg in self._segments if id_ in seg.rows]
+                if not holders:
+                    gone.add(id_)
+                    settled.add(id_)
+                elif all(seg.alive[seg.rows[id_]] for seg in holders):
+                    settled.add(id_)
+            if settled:
+                self._ids -= gone
+                self._tombstones = {id_: n for id_, n in self._tombstones.items() if id_ not in settled}
+                self._save_tombstones()
+            for segment in segments:
+                for path in self._segment_paths(segment.name):
+                    try:
+                        os.remove(path)
+                    except OSError as e:
+                        # Windows keeps mmapped files locked until the array is collected
+                        print(f"Could not remove old segment file {path}: {e}")
+
+    def compact(self):
+        """Merges all segments into one and drops deleted rows."""
+        with self._lock:
+            if self._segments:
+                self._merge(list(self._segments))
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None, limit: Optional[int] = None,
+            include: Optional[List[str]] = None) -> Dict[str, List]:
+        """Chroma-compatible lookup of live rows by id and/or metadata filter."""
+        include = ["documents", "metadatas"] if include is None else include
+        wanted = set(ids) if ids else None
+        segments = self._segments
+        result = {"ids": [], "documents": [], "metadatas": []}
+        for segment in segments:
+            alive = segment.alive
+            for row, id_ in enumerate(segment.ids):
+                if not alive[row]:
+                    continue
+                if wanted is not None and id_ not in wanted:
+                    continue
+                if where and not _matches(segment.metadatas[row], where):
+                    continue
+                result["ids"].append(id_)
+                if "documents" in include:
+                    result["documents"].append(segment.texts[row])
+                if "metadatas" in include:
+                    result["metadatas"].append(segment.metadatas[row])
+                if limit and len(result["ids"]) >= limit:
+                    return result
+        return result
+
+    def count(self) -> int:
+        """Number of live rows."""
+        return sum(segment.live for segment in self._segments)
+
+    # Search
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4,
+                                               filter: Optional[Dict] = None) -> List[Tuple[Document, float]]:
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query /= norm
+
+        candidates = []  # (score, segment, row)
+        for segment in self._segments:
+            alive = segment.alive
+            if not segment.live:
+                continue
+            scores = segment.matrix @ query.astype(segment.matrix.dtype, copy=False)
+            scores = scores.astype(np.float32, copy=False)
+            mask = None if segment.live == len(alive) else alive
+            if filter:
+                # Metadata filters still need a per-row check, but only of the live rows
+                mask = np.zeros(len(alive), dtype=bool)
+                live_rows = np.flatnonzero(alive)
+                mask[live_rows] = [_matches(segment.metadatas[r], filter) for r in live_rows]
+            if mask is not None:
+                scores = np.where(mask, scores, -np.inf)
+            top = min(k, len(scores))
+            rows = np.argpartition(-scores, top - 1)[:top]
+            candidates.extend((float(scores[r]), segment, int(r)) for r in rows if scores[r] != -np.inf)
+
+        candidates.sort(key=lambda c: c[0], reverse=True)
+        return [
+            (Document(page_content=seg.texts[r], metadata=seg.metadatas[r], id=seg.ids[r]), score)
+            for score, seg, r in candidates[:k]
+        ]
+
+    def similarity_search_by_vectors(self, embeddings: List[List[float]], k: int = 4) -> List[List[Document]]:
+        """Top-k documents for several queries, with one matrix product per segment."""
+        if not embeddings:
+            return []
+        queries = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries /= np.where(norms == 0, 1, norms)
+
+        candidates = [[] for _ in range(len(queries))]  # per query: (score, segment, row)
+        for segment in self._segments:
+            alive = segment.alive
+            if not segment.live:
+                continue
+            scores = (segment.matrix @ queries.T.astype(segment.matrix.dtype, copy=False)).astype(np.float32, copy=False)
+            if segment.live < len(alive):
+                scores = np.where(alive[:, None], scores, -np.inf)
+            top = min(k, len(segment.ids))
+            rows = np.argpartition(-scores, top - 1, axis=0)[:top]
+            for q in range(len(queries)):
+                candidates[q].extend((float(scores[r, q]), segment, int(r)) for r in rows[:, q] if scores[r, q] != -np.inf)
+
+        results = []
+        for found in candidates:
+            found.sort(key=lambda c: c[0], reverse=True)
+            results.append([Document(page_content=seg.texts[r], metadata=seg.metadatas[r], id=seg.ids[r]) for _, seg, r in found[:k]])
+        return results
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, filter: Optional[Dict] = None,
+                                    **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k=k, filter=filter)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[Dict] = None,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        embedding = self._embedding_function.embed_query(query)
+        return self.similarity_search_with_score_by_vector(embedding, k=k, filter=filter)
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict] = None,
+                          **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # Scores are cosine similarities in [-1, 1]
+        return lambda score: (score + 1) / 2
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[Dict]] = None,
+                   ids: Optional[List[str]] = None, persist_directory: str = "./numpy_index",
+                   **kwargs: Any) -> "NumpyVectorStore":
+        store = cls(embedding, persist_directory, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
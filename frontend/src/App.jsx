@@ -69,8 +69,8 @@ function MainApp({ activeTab, setActiveTab, user, onLogout }) {
       />
       <main className="app-main">
         {activeTab === 'chatbot' && <Chatbot user={user} />}
-        {activeTab === 'quizzes' && <Quizzes />}
-        {activeTab === 'flashcards' && <Flashcards />}
+        {activeTab === 'quizzes' && <Quizzes user={user} />}
+        {activeTab === 'flashcards' && <Flashcards user={user} />}
       </main>
     </div>
   );
@@ -4,7 +4,7 @@ import { Sparkles, ChevronLeft, ChevronRight, RotateCw, Loader, Upload } from 'l
 
 const API_BASE_URL = 'http://localhost:8000';
 
-const Flashcards = () => {
+const Flashcards = ({ user }) => {
     const [topic, setTopic] = useState('');
     const [status, setStatus] = useState('idle'); // idle, loading, active
     const [cards, setCards] = useState([]);
@@ -40,7 +40,7 @@ const Flashcards = () => {
                 const response = await fetch(`${API_BASE_URL}/flashcards`, {
                     method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ topic: `Key concepts from ${file.name}` })
+                    body: JSON.stringify({ topic: `Key concepts from ${file.name}`, user_email: user?.email })
                 });
 
                 if (response.ok) {
@@ -77,7 +77,7 @@ const Flashcards = () => {
             const response = await fetch(`${API_BASE_URL}/flashcards`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ topic: topic })
+                body: JSON.stringify({ topic: topic, user_email: user?.email })
             });
 
             if (response.ok) {
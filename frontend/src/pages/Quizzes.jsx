@@ -4,7 +4,7 @@ import { Sparkles, Folder, FileText, CheckCircle, ChevronRight, Play, RefreshCw,
 
 const API_BASE_URL = 'http://localhost:8000';
 
-const Quizzes = () => {
+const Quizzes = ({ user }) => {
     // idle, loading, ready, results
     const [status, setStatus] = useState('idle'); 
     const [step, setStep] = useState(1);
@@ -58,7 +58,8 @@ const Quizzes = () => {
                 body: JSON.stringify({
                     topic: topic, // If empty, backend handles it
                     count: numQuestions,
-                    difficulty: difficulty
+                    difficulty: difficulty,
+                    user_email: user?.email
                 })
             });
 
@@ -0,0 +1,107 @@
+"""
+Cold vs warm time-to-first-token against a running Ollama server.
+
+The cold run unloads the chat model first (keep_alive 0), so it includes the
+model load. The warm runs follow immediately, each with a different question
+but the same prompt prefix. Each run reports how many prompt tokens Ollama
+actually evaluated, so prefix reuse shows up as a low prompt_eval_count.
+With --shuffled, the same warm runs are repeated with the question moved in
+front of the instructions (the old prompt layout) for comparison.
+
+    python scripts/bench_model_warmup.py --runs 5
+    python scripts/bench_model_warmup.py --model llama3.1:8b --shuffled
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+import httpx
+
+from src.models import CHAT_MODEL, OLLAMA_BASE_URL, ModelManager
+
+CONTEXT = "\n\n".join(
+    f"Section {i}: Ocean currents are driven by wind, the Coriolis effect, temperature and salinity differences. "
+    f"Surface current {i} transports heat towards the poles and shapes the regional climate."
+    for i in range(12)
+)
+QUESTIONS = [
+    "What drives surface ocean currents?",
+    "How does the Coriolis effect change current direction?",
+    "Why does salinity matter for deep water circulation?",
+    "How do currents affect coastal climate?",
+    "What is thermohaline circulation?",
+    "Which forces create gyres?",
+]
+
+
+def build_prompt(question, shuffled=False):
+    from src.rag import get_answer_chain
+    prompt = get_answer_chain().first
+    text = prompt.format_messages(context=CONTEXT, question=question)[0].content
+    if shuffled:
+        # Variable part first: nothing after the first few tokens can be reused
+        text = f"Question: {question}\n\n" + text
+    return text
+
+
+def time_to_first_token(client, model, prompt):
+    started = time.perf_counter()
+    first = None
+    final = {}
+    payload = {"model": model, "messages": [{"role": "user", "content": prompt}], "stream": True, "options": {"num_predict": 32}}
+    with client.stream("POST", "/api/chat", json=payload) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if first is None and chunk.get("message", {}).get("content"):
+                first = time.perf_counter() - started
+            if chunk.get("done"):
+                final = chunk
+    return {
+        "ttft_ms": round((first or time.perf_counter() - started) * 1000, 1),
+        "load_ms": round(final.get("load_duration", 0) / 1e6, 1),
+        "prompt_eval_count": final.get("prompt_eval_count"),
+        "prompt_eval_ms": round(final.get("prompt_eval_duration", 0) / 1e6, 1),
+    }
+
+
+def report(label, results):
+    ttfts = [r["ttft_ms"] for r in results]
+    evals = [r["prompt_eval_count"] or 0 for r in results]
+    print(f"{label:>14}: ttft p50={statistics.median(ttfts)}ms max={max(ttfts)}ms  "
+          f"prompt tokens evaluated p50={statistics.median(evals)}  load={results[0]['load_ms']}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold vs warm TTFT benchmark")
+    parser.add_argument("--model", default=CHAT_MODEL)
+    parser.add_argument("--base-url", default=OLLAMA_BASE_URL)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--shuffled", action="store_true", help="Also measure the variable-first prompt layout")
+    args = parser.parse_args()
+
+    manager = ModelManager(base_url=args.base_url, chat=args.model)
+    with httpx.Client(base_url=args.base_url, timeout=600) as client:
+        manager.unload()
+        cold = time_to_first_token(client, args.model, build_prompt(QUESTIONS[0]))
+        report("cold", [cold])
+
+        warm = [time_to_first_token(client, args.model, build_prompt(QUESTIONS[(i + 1) % len(QUESTIONS)])) for i in range(args.runs)]
+        report("warm", warm)
+
+        if args.shuffled:
+            shuffled = [time_to_first_token(client, args.model, build_prompt(QUESTIONS[(i + 1) % len(QUESTIONS)], shuffled=True)) for i in range(args.runs)]
+            report("warm shuffled", shuffled)
+
+    print(f"cold/warm TTFT ratio: {cold['ttft_ms'] / max(statistics.median(r['ttft_ms'] for r in warm), 0.1):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
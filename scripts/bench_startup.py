@@ -0,0 +1,105 @@
+"""
+Measures backend cold-start cost: wall time to `import server` in a fresh
+interpreter and the heaviest imports reported by `python -X importtime`.
+
+    python scripts/bench_startup.py --runs 5 --top 15
+    python scripts/bench_startup.py --save startup.json
+    python scripts/bench_startup.py --baseline startup.json --max-regression 0.2
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+
+TIMED_IMPORT = "import time; t = time.perf_counter(); import server; print(time.perf_counter() - t)"
+
+
+def time_import(runs):
+    """Wall time of `import server`, one fresh interpreter per run."""
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", TIMED_IMPORT],
+            cwd=BACKEND_DIR, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"import server failed:\n{result.stderr}")
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def import_breakdown(top):
+    """Modules imported directly by `server`, sorted by cumulative import time (microseconds)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    modules, children = {}, []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        # Nested imports are indented two spaces per level and printed before
+        # their parent, so the level-1 entries seen before a root entry are its children
+        name = parts[2][1:]
+        level = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        if level == 1:
+            children.append((name, int(parts[1])))
+        elif level == 0:
+            if name == "server":
+                for child, us in children:
+                    modules[child] = modules.get(child, 0) + us
+                modules["server (own code)"] = int(parts[0])
+            children = []
+    return sorted(modules.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend startup benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--save", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", help="Compare against a JSON file written by --save")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed slowdown vs baseline (fraction)")
+    args = parser.parse_args()
+
+    timings = time_import(args.runs)
+    breakdown = import_breakdown(args.top)
+
+    results = {
+        "runs": args.runs,
+        "median_s": round(statistics.median(timings), 4),
+        "min_s": round(min(timings), 4),
+        "max_s": round(max(timings), 4),
+        "top_imports_ms": {name: round(us / 1000, 1) for name, us in breakdown},
+    }
+
+    print(f"import server: median {results['median_s']}s (min {results['min_s']}s, max {results['max_s']}s) over {args.runs} runs")
+    print("Heaviest imports:")
+    for name, ms in results["top_imports_ms"].items():
+        print(f"  {name:<30} {ms:>10.1f} ms")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        limit = baseline["median_s"] * (1 + args.max_regression)
+        if results["median_s"] > limit:
+            print(f"Startup regressed: {results['median_s']}s > {limit:.4f}s allowed (baseline {baseline['median_s']}s)")
+            sys.exit(1)
+        print(f"Within budget: {results['median_s']}s <= {limit:.4f}s")
+
+
+if __name__ == "__main__":
+    main()
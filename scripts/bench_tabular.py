@@ -0,0 +1,89 @@
+"""
+Ingests a synthetic CSV or Excel sheet through the tabular path and reports
+load/split/embed time and the number of vectors written. With --baseline, the
+old one-document-per-row CSVLoader path is measured as well (CSV only).
+
+Embeddings are deterministic fakes, so embed time reflects the store, not the model;
+with a real model, embedding cost scales with the vector counts shown here.
+
+    python scripts/bench_tabular.py --rows 100000 --baseline
+    python scripts/bench_tabular.py --rows 50000 --format xlsx
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+
+def make_table(path, rows, fmt):
+    import pandas as pd
+
+    rng = random.Random(0)
+    regions = ["North Atlantic", "South Atlantic", "Pacific", "Indian", "Southern", "Arctic"]
+    frame = pd.DataFrame({
+        "station_id": range(1, rows + 1),
+        "region": [rng.choice(regions) for _ in range(rows)],
+        "temperature_c": [round(rng.uniform(-2, 30), 2) for _ in range(rows)],
+        "salinity_psu": [round(rng.uniform(30, 38), 2) for _ in range(rows)],
+        "current_speed_ms": [round(rng.uniform(0, 2.5), 3) for _ in range(rows)],
+        "notes": [rng.choice(["", "storm", "eddy observed", "calibrated", "buoy drift"]) for _ in range(rows)],
+    })
+    if fmt == "csv":
+        frame.to_csv(path, index=False)
+    else:
+        frame.to_excel(path, index=False, sheet_name="measurements")
+
+
+def ingest(label, load, split_documents, store_dir):
+    from src.vector_index import NumpyVectorStore
+
+    store = NumpyVectorStore(DeterministicFakeEmbedding(size=256), store_dir)
+    started = time.perf_counter()
+    docs = load()
+    loaded = time.perf_counter()
+    splits = split_documents(docs)
+    split = time.perf_counter()
+    for i in range(0, len(splits), 1000):
+        store.add_documents(splits[i:i + 1000])
+    embedded = time.perf_counter()
+    print(f"{label:>9}: documents={len(docs)} vectors={store.count()} load_s={loaded - started:.2f} "
+          f"split_s={split - loaded:.2f} embed_s={embedded - split:.2f} total_s={embedded - started:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tabular ingestion benchmark")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--format", default="csv", choices=["csv", "xlsx"])
+    parser.add_argument("--baseline", action="store_true", help="Also run the one-document-per-row CSVLoader path")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_tabular_")
+    try:
+        from src import tabular
+        tabular.TABLES_DIR = os.path.join(workdir, "tables")
+        from src.ingestion import split_documents
+
+        path = os.path.join(workdir, f"bench.{args.format}")
+        make_table(path, args.rows, args.format)
+        print(f"{args.rows} rows, {os.path.getsize(path) / 2**20:.1f} MB {args.format}")
+
+        ingest("tabular", lambda: tabular.load_table(path), split_documents, os.path.join(workdir, "tabular"))
+        if args.baseline and args.format == "csv":
+            from langchain_community.document_loaders import CSVLoader
+            ingest("per-row", lambda: CSVLoader(path).load(), split_documents, os.path.join(workdir, "per_row"))
+
+        hits = tabular.lookup_rows(os.path.basename(path), column="station_id", value=str(args.rows // 2))
+        print(f"exact lookup station_id={args.rows // 2}: {len(hits['rows'])} row(s)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
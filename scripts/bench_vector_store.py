@@ -0,0 +1,107 @@
+"""
+Compares the NumPy memory-mapped index with Chroma on synthetic data:
+ingest rate, query latency (p50/p95), process memory and on-disk size.
+
+Embeddings are deterministic fakes, so the numbers measure the stores
+themselves and not the embedding model.
+
+    python scripts/bench_vector_store.py --docs 50000 --dim 768 --queries 200
+    python scripts/bench_vector_store.py --backends numpy --dtype float16
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.profiler import _peak_rss_bytes
+
+
+def current_rss_bytes():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return _peak_rss_bytes()
+
+
+def dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total
+
+
+def make_store(backend, embeddings, directory, dtype):
+    if backend == "numpy":
+        from src.vector_index import NumpyVectorStore
+        return NumpyVectorStore(embeddings, directory, dtype=dtype)
+    from langchain_chroma import Chroma
+    return Chroma(collection_name="bench", embedding_function=embeddings, persist_directory=directory)
+
+
+def run(backend, args):
+    embeddings = DeterministicFakeEmbedding(size=args.dim)
+    directory = tempfile.mkdtemp(prefix=f"bench_{backend}_")
+    try:
+        rss_before = current_rss_bytes()
+        store = make_store(backend, embeddings, directory, args.dtype)
+
+        texts = [f"chunk {i} about topic {i % 97}" for i in range(args.docs)]
+        metadatas = [{"source": f"file_{i % 20}.pdf", "page": i % 300} for i in range(args.docs)]
+        started = time.perf_counter()
+        for i in range(0, args.docs, args.batch):
+            store.add_texts(texts[i:i + args.batch], metadatas=metadatas[i:i + args.batch])
+        ingest_s = time.perf_counter() - started
+
+        latencies = []
+        filtered = []
+        for q in range(args.queries):
+            query = f"topic {q % 97}"
+            t = time.perf_counter()
+            store.similarity_search(query, k=args.k)
+            latencies.append((time.perf_counter() - t) * 1000)
+            t = time.perf_counter()
+            store.similarity_search(query, k=args.k, filter={"source": f"file_{q % 20}.pdf"})
+            filtered.append((time.perf_counter() - t) * 1000)
+
+        rss_after = current_rss_bytes()
+        return {
+            "backend": backend,
+            "ingest_docs_per_s": round(args.docs / ingest_s, 1),
+            "query_p50_ms": round(statistics.median(latencies), 3),
+            "query_p95_ms": round(statistics.quantiles(latencies, n=20)[-1], 3),
+            "filtered_p50_ms": round(statistics.median(filtered), 3),
+            "rss_delta_mb": round((rss_after - rss_before) / 2**20, 1) if rss_before and rss_after else None,
+            "disk_mb": round(dir_size(directory) / 2**20, 1),
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NumPy index vs Chroma benchmark")
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    parser.add_argument("--backends", nargs="+", default=["numpy", "chroma"])
+    args = parser.parse_args()
+
+    print(f"{args.docs} docs, dim {args.dim}, {args.queries} queries, k={args.k}, numpy dtype {args.dtype}")
+    for backend in args.backends:
+        # RSS is a delta around each run; pass one backend per invocation for cleaner memory numbers
+        result = run(backend, args)
+        print("  ".join(f"{key}={value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
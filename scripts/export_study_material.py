@@ -0,0 +1,41 @@
+"""
+Exports a user's chats and the generated flashcard decks and quizzes to a
+ZIP of DOCX or Markdown files. DOCX rendering runs in a process pool.
+
+    python scripts/export_study_material.py --user student@example.com --output export.zip
+    python scripts/export_study_material.py --user student@example.com --format md --output - > export.zip
+    python scripts/export_study_material.py --no-chats --all-decks --workers 8
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from src.exports import EXPORT_WORKERS, FORMATS, iter_export_items, write_export
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk export of chats and decks")
+    parser.add_argument("--user", help="Email of the user whose chats to export")
+    parser.add_argument("--format", default="docx", choices=FORMATS)
+    parser.add_argument("--output", default="export.zip", help="ZIP path, or - for stdout")
+    parser.add_argument("--workers", type=int, default=EXPORT_WORKERS)
+    parser.add_argument("--no-chats", action="store_true")
+    parser.add_argument("--no-decks", action="store_true")
+    parser.add_argument("--all-decks", action="store_true", help="Export every served deck, not just the user's")
+    args = parser.parse_args()
+
+    if not args.user and (args.no_decks or not args.all_decks):
+        parser.error("nothing to export: pass --user or --all-decks")
+
+    items = iter_export_items(args.user, include_chats=not args.no_chats, include_decks=not args.no_decks,
+                              all_decks=args.all_decks)
+    output = sys.stdout.buffer if args.output == "-" else args.output
+    stats = write_export(output, items, args.format, workers=args.workers)
+    # Keep stdout clean when it carries the archive
+    print(f"Exported {stats['files']} files ({stats['bytes'] / 2**20:.1f} MB uncompressed) in {stats['seconds']}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Stress test for concurrent chat writes: several processes append messages to
+the same chat at once, then the chat file is checked for lost messages. Run it
+after touching chat_history.py or the file locks, e.g. before deploying with
+several uvicorn workers.
+
+    python scripts/stress_chat_history.py --processes 8 --messages 50
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from src import chat_history
+
+USER = "stress@example.com"
+CHAT_ID = "stress-chat"
+
+
+def writer(chats_dir, worker, messages):
+    chat_history.CHATS_DIR = chats_dir
+    for i in range(messages):
+        chat_history.save_message(USER, CHAT_ID, "user", f"worker {worker} message {i}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent chat history write test")
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--messages", type=int, default=50, help="Messages written by each process")
+    args = parser.parse_args()
+
+    chats_dir = tempfile.mkdtemp(prefix="chats_")
+    try:
+        chat_history.CHATS_DIR = chats_dir
+        started = time.perf_counter()
+        procs = [
+            multiprocessing.Process(target=writer, args=(chats_dir, worker, args.messages))
+            for worker in range(args.processes)
+        ]
+        for proc in procs:
+            proc.start()
+        for proc in procs:
+            proc.join()
+        elapsed = time.perf_counter() - started
+
+        chat = chat_history.get_chat_history(USER, CHAT_ID)
+        expected = args.processes * args.messages
+        found = len(chat["messages"]) if chat else 0
+        print(f"{args.processes} processes x {args.messages} messages: {found}/{expected} saved in {elapsed:.2f}s")
+        if found != expected or any(proc.exitcode for proc in procs):
+            print("FAILED: messages were lost or a writer crashed")
+            sys.exit(1)
+    finally:
+        shutil.rmtree(chats_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()